@@ -0,0 +1,60 @@
+"""
+Measure how long parallel_alphabeta takes to choose a move against the
+number of workers, on a fixed Stonehenge position, next to the time of
+recursive_alphabeta.
+
+Run it with: python alphabeta_benchmark.py [workers ...]
+"""
+import sys
+from time import monotonic
+from unittest.mock import patch
+from stonehenge import StoneHenge
+from strategy import (TranspositionTable, get_pool, parallel_alphabeta,
+                      recursive_alphabeta, shutdown_pools)
+
+# the position timed: the board size and the moves played on it so far
+SIZE = 4
+OPENING = ['A']
+
+
+def make_game() -> StoneHenge:
+    """
+    Return a new StoneHenge game on a board of side length SIZE, with the
+    moves of OPENING played.
+    """
+    with patch('builtins.input', return_value=str(SIZE)):
+        game = StoneHenge(True)
+    for move in OPENING:
+        game.current_state = game.current_state.make_move(move)
+    return game
+
+
+def main(workers: list) -> None:
+    """
+    Print the seconds recursive_alphabeta takes, and then the seconds
+    parallel_alphabeta takes with each number of workers and its speedup
+    over the first number of workers. Every search starts with an empty
+    table, as each pool is shut down once it is timed.
+    """
+    start = monotonic()
+    move = recursive_alphabeta(make_game(), TranspositionTable())
+    print('recursive_alphabeta: {} in {:.2f}s'.format(move,
+                                                      monotonic() - start))
+    print('{:>7}{:>10}{:>9}'.format('workers', 'seconds', 'speedup'))
+    first = None
+    for count in workers:
+        # start every worker before timing them
+        get_pool(count)[0].map(abs, range(count))
+        start = monotonic()
+        found = parallel_alphabeta(make_game(), count)
+        seconds = monotonic() - start
+        if first is None:
+            first = seconds
+        print('{:>7}{:>10.2f}{:>9.2f}{}'.format(
+            count, seconds, first / seconds,
+            '' if found == move else '  chose {}'.format(found)))
+        shutdown_pools()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8, 16, 32])
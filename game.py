@@ -47,51 +47,6 @@ class Game:
 """A place where the magic of stonehenge happens"""
 
 
-# Helper Functions
-
-def dict_rows(n: int)-> dict:
-    """A board generator for the game stonehenge"""
-    cells = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K',
-             'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W',
-             'X', 'Y', 'Z']
-    lc = 2
-    row = 2
-    d = [cells[0:2]]
-    while row < n+1:
-        d.append(cells[lc:lc + row + 1])
-        lc += row + 1
-        row += 1
-    d.append(cells[lc:lc+n])
-    rows = {}
-    for num in range(n):
-        rows['row{}'.format(num + 1)] = d[num]
-    rows['row{}'.format(n + 1)] = d[-1]
-    return rows
-
-
-def ley_lines_horizontal(n)->dict:
-    """Makes the initlal horizontal ley lines"""
-    hlm = {}
-    rows = dict_rows(n)
-    marker = '@'
-    for row in rows:
-        hlm[row] = marker
-    return hlm
-
-
-def ley_lines_vertical(n)->dict:
-    """Makes the initial vertical ley lines"""
-    vlm = {}
-    num_vlm = []
-    marker = '@'
-    for _ in range(n*2 + 2):
-        num_vlm.append(marker)
-    vlm['first2'] = num_vlm[0:2]
-    vlm['lastn'] = num_vlm[2:n + 2]
-    vlm['siden'] = num_vlm[n + 2:]
-    return vlm
-
-
 # *****************************************************************************
 
 
@@ -104,11 +59,7 @@ class StoneHenge(Game):
         """
         self.is_p1_turn = p1_starts
         self.board = int(input('choose the size of the board: '))
-        cells = dict_rows(self.board)
-        hlm = ley_lines_horizontal(self.board)
-        vlm = ley_lines_vertical(self.board)
-        self.current_state = StoneHengeState(self.is_p1_turn, self.board, cells,
-                                             hlm, vlm)
+        self.current_state = StoneHengeState(self.is_p1_turn, self.board)
 
     def get_instructions(self) -> str:
         """
@@ -122,24 +73,8 @@ class StoneHenge(Game):
         """
         Return whether or not this game is over at state.
         """
-        # when all the leylines have been captured, the game is over
-        over = False
-        hori = []
-        verti = []
-        for row in state.hlm:
-            hori.append(state.hlm[row])
-        for row in state.vlm:
-            verti.extend(state.vlm[row])
-        total = hori + verti
-        num_1 = total.count('1')
-        num_2 = total.count('2')
-        if len(total) % 2 == 0:
-            need = len(total) / 2
-        else:
-            need = len(total) // 2 + 1
-        if num_1 >= need or num_2 >= need:
-            over = True
-        return over
+        # when half the leylines have been captured, the game is over
+        return state.is_terminal()
 
     def is_winner(self, player: str) -> bool:
         """
@@ -147,19 +82,7 @@ class StoneHenge(Game):
 
         Precondition: player is 'p1' or 'p2'.
         """
-        hori = []
-        verti = []
-        for row in self.current_state.hlm:
-            hori.append(self.current_state.hlm[row])
-        for row in self.current_state.vlm:
-            verti.extend(self.current_state.vlm[row])
-        total = hori + verti
-        num_1 = total.count('1')
-        num_2 = total.count('2')
-        if num_1 > num_2 and self.is_over(self.current_state):
-            return player == 'p1'
-        elif num_2 > num_1 and self.is_over(self.current_state):
-            return player == 'p2'
+        return self.current_state.winner() == player
 
     def str_to_move(self, string: str) -> Any:
         """
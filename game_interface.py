@@ -12,6 +12,9 @@ your own curiousity!)
 from typing import Callable
 
 from game import StoneHenge
+from mcts import mcts, parallel_mcts
+from proof_number import proof_number
+from tablebase import tablebase
 from strategy import *
 from subtract_square_game import SubtractSquareGame
 
@@ -23,9 +26,24 @@ playable_games = {'s': SubtractSquareGame,
 # TODO: Replace None with the corresponding function names for your strategies.
 # 'mr' should map to your recursive implementation of minimax while
 # 'mi' should map to your iterative implementation of minimax
+# 'ar' and 'ai' are the same searches with alpha-beta pruning
+# 'id' searches deeper and deeper until its time is up
+# 'pa' is 'ar' with the root moves split across worker processes
+# 'mc' plays the move most visited by Monte Carlo tree search
+# 'pm' is 'mc' run in every worker process, with their visits added up
+# 'pn' plays a move that proof-number search proves wins, or else draws
+# 'tb' looks up 'mr''s move in a solved table of every position
 usable_strategies = {'i': interactive_strategy,
                      'mr': recursive_minimax,
-                     'mi': iterative_minimax}
+                     'mi': iterative_minimax,
+                     'ar': recursive_alphabeta,
+                     'ai': iterative_alphabeta,
+                     'id': iterative_deepening,
+                     'pa': parallel_alphabeta,
+                     'mc': mcts,
+                     'pm': parallel_mcts,
+                     'pn': proof_number,
+                     'tb': tablebase}
 
 
 class GameInterface:
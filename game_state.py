@@ -3,6 +3,8 @@ The GameState superclass.
 
 NOTE: You do not have to run python-ta on this file.
 """
+from itertools import permutations, product
+from random import Random
 from typing import Any
 
 
@@ -40,6 +42,14 @@ class GameState:
         """
         raise NotImplementedError
 
+    def get_distinct_moves(self) -> list:
+        """
+        Return the possible moves a search has to try: one move of each group
+        that always score the same. Subclasses that know of such groups leave
+        out all but the first move of each.
+        """
+        return self.get_possible_moves()
+
     def get_current_player_name(self) -> str:
         """
         Return 'p1' if the current player is Player 1, and 'p2' if the current
@@ -55,12 +65,71 @@ class GameState:
         """
         raise NotImplementedError
 
+    def apply(self, move: Any) -> None:
+        """
+        Apply move to this GameState in place, so that undo() can take it
+        back. Searches use this to walk one board instead of making a new
+        GameState for every move.
+
+        A GameState being changed by apply must not be used as a dict key.
+        """
+        raise NotImplementedError
+
+    def undo(self) -> None:
+        """
+        Take back the last move applied to this GameState by apply().
+        """
+        raise NotImplementedError
+
     def is_valid_move(self, move: Any) -> bool:
         """
         Return whether move is a valid move for this GameState.
         """
         return move in self.get_possible_moves()
 
+    def move_priority(self, move: Any) -> int:
+        """
+        Return a number that is larger for moves more likely to be good for
+        the current player, which searches use to try those moves first.
+        """
+        return 0
+
+    def is_terminal(self) -> bool:
+        """
+        Return whether the game is over at this GameState.
+        """
+        raise NotImplementedError
+
+    def winner(self) -> Any:
+        """
+        Return 'p1' or 'p2' if that player has won at this GameState, or None
+        if the game is not over or is a tie.
+        """
+        raise NotImplementedError
+
+    def key(self) -> Any:
+        """
+        Return a hashable value identifying this GameState: equal states,
+        however they were reached, have equal keys.
+        """
+        return repr(self)
+
+    def canonical_key(self) -> Any:
+        """
+        Return the key shared by this GameState and every state that is the
+        same as it up to a symmetry of the game, so caches can store them
+        once. States have no symmetries unless a subclass says so.
+        """
+        return self.key()
+
+    def start_search(self) -> None:
+        """
+        Called by a search on the state it starts from, before it asks any
+        state for its canonical_key. Subclasses keep to the symmetries that
+        leave this state unchanged from here on, as the states the search
+        reaches can only have twins under those.
+        """
+
     def __repr__(self) -> Any:
         """
         Return a representation of this state (which can be used for
@@ -76,23 +145,33 @@ class GameState:
         raise NotImplementedError
 
 
+def cell_label(cell: int) -> str:
+    """
+    Return the letters naming cell number cell: A to Z, then AA, AB and so on.
+
+    >>> cell_label(0)
+    'A'
+    >>> cell_label(26)
+    'AA'
+    """
+    label = ''
+    cell += 1
+    while cell > 0:
+        cell, letter = divmod(cell - 1, 26)
+        label = chr(ord('A') + letter) + label
+    return label
+
+
 def dict_rows(n: int) -> dict:
     """A board generator for the game stonehenge"""
-    cells = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K',
-             'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W',
-             'X', 'Y', 'Z']
-    lc = 2
-    row = 2
-    d = [cells[0:2]]
-    while row < n + 1:
-        d.append(cells[lc:lc + row + 1])
-        lc += row + 1
-        row += 1
-    d.append(cells[lc:lc + n])
     rows = {}
-    for num in range(n):
-        rows['row{}'.format(num + 1)] = d[num]
-    rows['row{}'.format(n + 1)] = d[-1]
+    cell = 0
+    for num in range(n + 1):
+        # row i has i + 1 cells, except the last row which has n
+        length = num + 2 if num < n else n
+        rows['row{}'.format(num + 1)] = [cell_label(i) for i in
+                                         range(cell, cell + length)]
+        cell += length
     return rows
 
 
@@ -119,191 +198,374 @@ def ley_lines_vertical(n) -> dict:
     return vlm
 
 
+def _draw(line: list, col: int, text: str) -> None:
+    """Write text into the list of characters line, starting at col."""
+    while len(line) < col + len(text):
+        line.append(' ')
+    line[col:col + len(text)] = text
+
+
 def board_design(n: int, rows: dict, hlm: dict, vlm: dict) -> str:
-    """Makes a board of size n for the game stonehenge"""
-
-    board = ""
-    k = n + 4
-    indent = " "
-    board = indent * (k + 6) + board
-    for lm in vlm['first2']:
-        board += lm + "   "
-    board += '\n'
-    board += indent * (k + 5)
-    for _ in range(2):
-        board += '/' + "   "
-    board += '\n'
-    board += indent * (k)
-    for o in range(n - 1):
-        board += hlm['row{}'.format(o + 1)] + " " + "-" + " "
-        for i in range(len(rows['row{}'.format(o + 1)]) - 1):
-            board += rows['row{}'.format(o + 1)][i] + " " + "-" + " "
-        board += rows['row{}'.format(o + 1)][-1] + "   " + vlm['siden'][o]
-        board += '\n'
-        k -= 1
-        board += indent * (k + 4)
-        for i in range(len(rows['row{}'.format(o + 1)])):
-            board += '/' + " "
-            board += '\\' " "
-        board += '/'
-        board += '\n'
-        k -= 2
-        board += indent * k
-    board += " "
-    board += hlm['row{}'.format(n)] + " " + "-" + " "
-    for i in range(len(rows['row{}'.format(n)]) - 1):
-        board += rows['row{}'.format(n)][i] + " " + "-" + " "
-    board += rows['row{}'.format(n)][-1]
-    board += '\n'
-    k -= 1
-    board += indent * (k + 7)
+    """Makes a board of size n for the game stonehenge
 
+    Every cell is drawn as wide as the longest cell label on the board, so
+    boards with labels past Z still line up.
+    """
+    width = len(cell_label((n * n + 5 * n) // 2 - 1))
+    half = (width + 4) // 2  # shift between a row and the one below it
+    step = 2 * half  # distance between neighbouring cells in a row
+    dash = width + (step - width - 1) // 2  # where '-' goes after a cell
+    lines = [[] for _ in range(2 * n + 5)]
+
+    def draw_row(line, col, row, marker, side):
+        """Draw the ley-line marker, cells and side marker of a row."""
+        _draw(lines[line], col - step, marker)
+        for i in range(len(rows[row])):
+            _draw(lines[line], col + (i - 1) * step + dash, '-')
+            _draw(lines[line], col + i * step, rows[row][i])
+        if side is not None:
+            _draw(lines[line], col + len(rows[row]) * step, side)
+
+    for o in range(n):
+        col = half * (n - 1 - o) + step
+        if o == 0:
+            for i in range(2):
+                _draw(lines[0], col + i * step + width + 1, vlm['first2'][i])
+                _draw(lines[1], col + i * step + width, '/')
+        else:
+            for i in range(o + 1):
+                _draw(lines[2 * o + 1], col + half + i * step - 1, '/')
+                _draw(lines[2 * o + 1], col + half + i * step + width, '\\')
+            _draw(lines[2 * o + 1], col + half + o * step + step - 1, '/')
+        draw_row(2 * o + 2, col, 'row{}'.format(o + 1),
+                 hlm['row{}'.format(o + 1)],
+                 vlm['siden'][o] if o < n - 1 else None)
+
+    col = step + half
     for i in range(n):
-        board += '\\' + " "
-        board += '/' + " "
-    board += '\\'
-    board += '\n'
-    k -= 2
-    board += indent * (k + 6)
-    board += hlm['row{}'.format(n + 1)] + " " + "-" + " "
-    for i in range(len(rows['row{}'.format(n + 1)]) - 1):
-        board += rows['row{}'.format(n + 1)][i] + " " + "-" + " "
-    board += rows['row{}'.format(n + 1)][-1] + "   " + vlm['siden'][-1]
-    board += '\n'
-    board += indent * (k + 11)
-    for i in range(n):
-        board += '\\' + "   "
-    board += '\n'
-    board += indent * (k + 13)
-    for k in vlm['lastn']:
-        board += k + "   "
-    return board
+        _draw(lines[2 * n + 1], col + i * step - 1, '\\')
+        _draw(lines[2 * n + 1], col + i * step + width, '/')
+        _draw(lines[2 * n + 3], col + i * step + width, '\\')
+        _draw(lines[2 * n + 4], col + i * step + width + 1, vlm['lastn'][i])
+    _draw(lines[2 * n + 1], col + n * step - 1, '\\')
+    draw_row(2 * n + 2, col, 'row{}'.format(n + 1),
+             hlm['row{}'.format(n + 1)], vlm['siden'][-1])
+    return '\n'.join(''.join(line).rstrip() for line in lines)
 
 
 def last_n_lm(n, cells):
-    """A helper function"""
+    """Return the cells on the n ley-lines drawn below the last row, from
+    left to right, each listed from the bottom up."""
     s = {}
-    for i in range(n):
-        s[i + 1] = []
-    for i in range(n):
-        s[i + 1] = []
-    for lm in s:
-        if lm == 1:
-            s[lm].append(cells['row{}'.format(n + 1)][0])
-            s[lm].append(cells['row{}'.format(n)][0])
-        elif lm == 2:
-            s[lm].append(cells['row{}'.format(n + 1)][1])
-            s[lm].append(cells['row{}'.format(n)][1])
-            s[lm].append(cells['row{}'.format(n - 1)][0])
-        elif lm == 3:
-            s[lm].append(cells['row{}'.format(n + 1)][2])
-            s[lm].append(cells['row{}'.format(n)][2])
-            s[lm].append(cells['row{}'.format(n - 1)][1])
-            s[lm].append(cells['row{}'.format(n - 2)][0])
-        elif lm == 4:
-            s[lm].append(cells['row{}'.format(n + 1)][3])
-            s[lm].append(cells['row{}'.format(n)][3])
-            s[lm].append(cells['row{}'.format(n - 1)][2])
-            s[lm].append(cells['row{}'.format(n - 2)][1])
-            s[lm].append(cells['row{}'.format(n - 3)][0])
-
-        elif lm == 5:
-            s[lm].append(cells['row{}'.format(n + 1)][4])
-            s[lm].append(cells['row{}'.format(n)][4])
-            s[lm].append(cells['row{}'.format(n - 1)][3])
-            s[lm].append(cells['row{}'.format(n - 2)][2])
-            s[lm].append(cells['row{}'.format(n - 3)][1])
-            s[lm].append(cells['row{}'.format(n - 4)][0])
-
+    for lm in range(1, n + 1):
+        s[lm] = [cells['row{}'.format(n + 1)][lm - 1]]
+        for k in range(lm):
+            s[lm].append(cells['row{}'.format(n - k)][lm - 1 - k])
     return s
 
 
 def side_n_lm(n, cells):
-    """A helper function"""
+    """Return the cells on the n ley-lines drawn right of the rows, from
+    top to bottom, each listed from the top down."""
     s = {}
-    for i in range(n):
-        s[i + 1] = []
-    if n == 1:
-        s[n].append(cells['row{}'.format(n)][-1])
-    elif n == 2:
-        s[n - 1].append(cells['row{}'.format(n)][-1])
-        s[n - 1].append(cells['row{}'.format(n + 1)][-1])
-        s[n].append(cells['row{}'.format(n)][-1])
-        s[n].append(cells['row{}'.format(n - 1)][-1])
-    elif n == 3:
-        s[n - 2].append(cells['row{}'.format(n - 1)][-1])
-        s[n - 2].append(cells['row{}'.format(n)][-2])
-        s[n - 2].append(cells['row{}'.format(n + 1)][-2])
-        s[n - 1].append(cells['row{}'.format(n)][-1])
-        s[n - 1].append(cells['row{}'.format(n + 1)][-1])
-        s[n].append(cells['row{}'.format(n - 2)][-1])
-        s[n].append(cells['row{}'.format(n - 1)][-1])
-        s[n].append(cells['row{}'.format(n)][-1])
-
-    elif n == 4:
-        s[n - 3].append(cells['row{}'.format(n - 2)][-1])
-        s[n - 3].append(cells['row{}'.format(n - 1)][-2])
-        s[n - 3].append(cells['row{}'.format(n)][-3])
-        s[n - 3].append(cells['row{}'.format(n + 1)][-3])
-        s[n - 2].append(cells['row{}'.format(n - 1)][-1])
-        s[n - 2].append(cells['row{}'.format(n)][-2])
-        s[n - 2].append(cells['row{}'.format(n + 1)][-2])
-        s[n - 1].append(cells['row{}'.format(n)][-1])
-        s[n - 1].append(cells['row{}'.format(n + 1)][-1])
-        s[n].append(cells['row{}'.format(n - 3)][-1])
-        s[n].append(cells['row{}'.format(n - 2)][-1])
-        s[n].append(cells['row{}'.format(n - 1)][-1])
-        s[n].append(cells['row{}'.format(n)][-1])
-
-    elif n == 5:
-        s[n - 4].append(cells['row{}'.format(n - 3)][-1])
-        s[n - 4].append(cells['row{}'.format(n - 2)][-2])
-        s[n - 4].append(cells['row{}'.format(n - 1)][-3])
-        s[n - 4].append(cells['row{}'.format(n)][-4])
-        s[n - 4].append(cells['row{}'.format(n + 1)][-4])
-        s[n - 3].append(cells['row{}'.format(n - 2)][-1])
-        s[n - 3].append(cells['row{}'.format(n - 1)][-2])
-        s[n - 3].append(cells['row{}'.format(n)][-3])
-        s[n - 3].append(cells['row{}'.format(n + 1)][-3])
-        s[n - 2].append(cells['row{}'.format(n - 1)][-1])
-        s[n - 2].append(cells['row{}'.format(n)][-2])
-        s[n - 2].append(cells['row{}'.format(n + 1)][-2])
-        s[n - 1].append(cells['row{}'.format(n)][-1])
-        s[n - 1].append(cells['row{}'.format(n + 1)][-1])
-        s[n].append(cells['row{}'.format(n - 4)][-1])
-        s[n].append(cells['row{}'.format(n - 3)][-1])
-        s[n].append(cells['row{}'.format(n - 2)][-1])
-        s[n].append(cells['row{}'.format(n - 1)][-1])
-        s[n].append(cells['row{}'.format(n)][-1])
+    for lm in range(1, n):
+        s[lm] = [cells['row{}'.format(row)][lm + 1]
+                 for row in range(lm + 1, n + 1)]
+        s[lm].append(cells['row{}'.format(n + 1)][lm])
+    s[n] = [cells['row{}'.format(row)][-1] for row in range(1, n + 1)]
     return s
 
 
+def _count_cells(cells: int) -> int:
+    """
+    Return the number of cells set in the bitmask cells.
+
+    >>> _count_cells(0b1011)
+    3
+    """
+    return bin(cells).count('1')
+
+
+# int.bit_count does the same in C, from Python 3.10 on
+count_cells = getattr(int, 'bit_count', _count_cells)
+
+
+class StoneHengeGeometry:
+    """
+    The cells and ley-lines of a Stonehenge board with side length size,
+    shared by every state played on a board of that size.
+
+    labels - the letter of each cell, in board order
+    index - the cell number of each letter
+    rows - the cell numbers in each row, from top to bottom
+    lines - a bitmask of the cells on each ley-line, in the order the
+            ley-lines are drawn: the rows, then first2, lastn and siden
+    needs - the number of cells a player must own to capture each ley-line
+    need - the number of ley-lines a player must capture to win
+    cell_lines - for each cell, a (bit, mask, need, line) for each ley-line
+                 through it, where bit marks the ley-line in a captured-lines
+                 mask
+    cell_bits - for each cell, the captured-lines mask of every ley-line
+                through it
+    zobrist_cells - for each cell, a random 64-bit key for it being empty,
+                    claimed by p1 and claimed by p2
+    zobrist_lines - for each ley-line, a key for it being uncaptured (0),
+                    captured by p1 and captured by p2
+    zobrist_turn - the key for it being p1's turn
+    symmetries - for each symmetry of the board other than the identity,
+                 byte tables mapping a cells mask and a ley-lines mask to
+                 their images, for permute()
+    """
+
+    def __init__(self, size: int) -> None:
+        """
+        Initialize the cells and ley-lines of a board with side length size.
+        """
+        self.size = size
+        letter_rows = dict_rows(size)
+        self.labels = []
+        number_rows = {}
+        for row in letter_rows:
+            number_rows[row] = list(range(len(self.labels),
+                                          len(self.labels) +
+                                          len(letter_rows[row])))
+            self.labels.extend(letter_rows[row])
+        self.index = {self.labels[i]: i for i in range(len(self.labels))}
+        self.rows = list(number_rows.values())
+
+        line_cells = self.rows[:]
+        line_cells.append([row[0] for row in self.rows[:size]])
+        line_cells.append([row[1] for row in self.rows[:size]] +
+                          [self.rows[size][0]])
+        line_cells.extend(last_n_lm(size, number_rows).values())
+        line_cells.extend(side_n_lm(size, number_rows).values())
+        self.lines = []
+        self.needs = []
+        for cells in line_cells:
+            mask = 0
+            for cell in cells:
+                mask |= 1 << cell
+            self.lines.append(mask)
+            self.needs.append(len(cells) // 2 + len(cells) % 2)
+        self.need = len(self.lines) // 2 + len(self.lines) % 2
+
+        self.cell_lines = [[] for _ in self.labels]
+        for line in range(len(self.lines)):
+            for cell in range(len(self.labels)):
+                if self.lines[line] >> cell & 1:
+                    self.cell_lines[cell].append((1 << line, self.lines[line],
+                                                  self.needs[line], line))
+        self.cell_bits = [sum(line[0] for line in cell_lines)
+                          for cell_lines in self.cell_lines]
+
+        # seeded by size, so a state hashes the same in every process
+        keys = Random('stonehenge {}'.format(size))
+        self.zobrist_cells = [(keys.getrandbits(64), keys.getrandbits(64),
+                               keys.getrandbits(64)) for _ in self.labels]
+        self.zobrist_lines = [(0, keys.getrandbits(64), keys.getrandbits(64))
+                              for _ in self.lines]
+        self.zobrist_turn = keys.getrandbits(64)
+        self.symmetries = self._symmetries()
+
+    def _symmetries(self) -> list:
+        """
+        Return the symmetries of this board, other than the identity.
+
+        Each cell is numbered by its row and by its ley-lines in the two
+        diagonal directions, from 0 to size. Every symmetry of the board
+        maps these three numberings onto each other in some order, each
+        either kept or reversed.
+        """
+        size = self.size
+        coordinates = []
+        for row in range(len(self.rows)):
+            for i in range(len(self.rows[row])):
+                if row < size:
+                    coordinates.append((row, i, i - row + size - 1))
+                else:
+                    coordinates.append((row, i + 1, i))
+        cell_at = {coordinates[cell]: cell
+                   for cell in range(len(coordinates))}
+        line_at = {self.lines[line]: line for line in range(len(self.lines))}
+
+        symmetries = []
+        for order in permutations(range(3)):
+            for flips in product([False, True], repeat=3):
+                images = [tuple(size - point[order[k]] if flips[k]
+                                else point[order[k]] for k in range(3))
+                          for point in coordinates]
+                if images == coordinates or \
+                        not all(image in cell_at for image in images):
+                    continue
+                cells = _byte_tables([cell_at[image] for image in images])
+                lines = [line_at[permute(mask, cells)] for mask in self.lines]
+                symmetries.append((cells, _byte_tables(lines)))
+        return symmetries
+
+    def __reduce__(self) -> tuple:
+        """
+        Pickle only the size, so a state sent to another process uses that
+        process's shared geometry instead of a copy of this one.
+        """
+        return get_geometry, (self.size,)
+
+
+def _byte_tables(image: list) -> list:
+    """
+    Return tables for permute() to map each bit i of a mask to bit image[i],
+    one table for each byte of the mask.
+    """
+    tables = []
+    for start in range(0, len(image), 8):
+        table = []
+        for byte in range(256):
+            mask = 0
+            for bit in range(min(8, len(image) - start)):
+                if byte >> bit & 1:
+                    mask |= 1 << image[start + bit]
+            table.append(mask)
+        tables.append(table)
+    return tables
+
+
+def permute(mask: int, tables: list) -> int:
+    """
+    Return mask with its bits moved by tables, made by _byte_tables.
+    """
+    result = 0
+    for table in tables:
+        result |= table[mask & 255]
+        mask >>= 8
+    return result
+
+
+_geometries = {}
+
+
+def get_geometry(size: int) -> StoneHengeGeometry:
+    """
+    Return the StoneHengeGeometry with side length size.
+    """
+    if size not in _geometries:
+        _geometries[size] = StoneHengeGeometry(size)
+    return _geometries[size]
+
+
 class StoneHengeState(GameState):
     """
     The state of a game at a certain point in time.
 
+    Cells and ley-lines are stored as bitmasks over the numbering of the
+    StoneHengeGeometry of its board; letters are only used to name
+    moves and to draw the board.
+
     WIN - score if player is in a winning position
     LOSE - score if player is in a losing position
     DRAW - score if player is in a tied position
     p1_turn - whether it is p1's turn or not
+    p1_cells, p2_cells - the cells claimed by each player
+    p1_lines, p2_lines - the ley-lines captured by each player
+    p1_captured, p2_captured - the number of ley-lines captured by each player
+    over - whether a player has captured enough ley-lines to win
+    zobrist - a 64-bit Zobrist hash of this state, which make_move updates
+              instead of recomputing
+    symmetries - the indexes of the geometry's symmetries canonical_key
+                 uses: all of them, until start_search keeps those of the
+                 state a search starts from, for it and the states made
+                 from it
     """
     WIN: int = 1
     LOSE: int = -1
     DRAW: int = 0
     p1_turn: bool
 
-    def __init__(self, is_p1_turn: bool, board: int, cells: dict, hlm: dict,
-                 vlm: dict) -> None:
+    def __init__(self, is_p1_turn: bool, board: int, p1_cells: int = 0,
+                 p2_cells: int = 0, p1_lines: int = 0, p2_lines: int = 0,
+                 zobrist: int = None) -> None:
         """
         Initialize this game state and set the current player based on
-        is_p1_turn.
+        is_p1_turn. zobrist is computed from the cells and ley-lines if it
+        is not given.
 
         """
         self.p1_turn = is_p1_turn
         self.board_size = board
-        self.cells = cells
-        self.hlm = hlm
-        self.vlm = vlm
+        self.geometry = get_geometry(board)
+        self.p1_cells = p1_cells
+        self.p2_cells = p2_cells
+        self.p1_lines = p1_lines
+        self.p2_lines = p2_lines
+        self.p1_captured = count_cells(p1_lines)
+        self.p2_captured = count_cells(p2_lines)
+        self.over = max(self.p1_captured,
+                        self.p2_captured) >= self.geometry.need
+        self.symmetries = range(len(self.geometry.symmetries))
+        self._key = None
+        self._canonical = None
+        self._history = []
+        if zobrist is None:
+            zobrist = self._zobrist()
+        self.zobrist = zobrist
+
+    def _zobrist(self) -> int:
+        """
+        Return the Zobrist hash of this state, computed from scratch.
+        """
+        geometry = self.geometry
+        zobrist = geometry.zobrist_turn if self.p1_turn else 0
+        for cell in range(len(geometry.labels)):
+            owner = self._marker(self.p1_cells, self.p2_cells, cell, '0')
+            zobrist ^= geometry.zobrist_cells[cell][int(owner)]
+        for line in range(len(geometry.lines)):
+            owner = self._marker(self.p1_lines, self.p2_lines, line, '0')
+            zobrist ^= geometry.zobrist_lines[line][int(owner)]
+        return zobrist
+
+    @property
+    def cells(self) -> dict:
+        """
+        Return the rows of this board, with each cell shown as its letter or
+        as the player who claimed it.
+        """
+        cells = {}
+        for i in range(len(self.geometry.rows)):
+            cells['row{}'.format(i + 1)] = [self._marker(
+                self.p1_cells, self.p2_cells, cell, self.geometry.labels[cell])
+                                            for cell in self.geometry.rows[i]]
+        return cells
+
+    @property
+    def hlm(self) -> dict:
+        """
+        Return the markers of the horizontal ley-lines, by row.
+        """
+        hlm = {}
+        for i in range(len(self.geometry.rows)):
+            hlm['row{}'.format(i + 1)] = self._marker(self.p1_lines,
+                                                      self.p2_lines, i, '@')
+        return hlm
+
+    @property
+    def vlm(self) -> dict:
+        """
+        Return the markers of the diagonal ley-lines.
+        """
+        n = self.board_size
+        markers = [self._marker(self.p1_lines, self.p2_lines, line, '@')
+                   for line in range(n + 1, len(self.geometry.lines))]
+        return {'first2': markers[0:2], 'lastn': markers[2:n + 2],
+                'siden': markers[n + 2:]}
+
+    @staticmethod
+    def _marker(p1_mask: int, p2_mask: int, bit: int, empty: str) -> str:
+        """
+        Return '1' or '2' if that player's mask has bit set, or empty.
+        """
+        if p1_mask >> bit & 1:
+            return '1'
+        elif p2_mask >> bit & 1:
+            return '2'
+        return empty
 
     def __str__(self) -> str:
         """
@@ -316,31 +578,38 @@ class StoneHengeState(GameState):
         """
         Return all possible moves that can be applied to this state.
         """
-        over = False
-        hori = []
-        verti = []
-        for row in self.hlm:
-            hori.append(self.hlm[row])
-        for row in self.vlm:
-            verti.extend(self.vlm[row])
-        total = hori + verti
-        num_1 = total.count('1')
-        num_2 = total.count('2')
-        if len(total) % 2 == 0:
-            need = len(total) / 2
-        else:
-            need = len(total) // 2 + 1
-        if num_1 >= need or num_2 >= need:
-            over = True
-        if over:
+        if self.over:
+            return []
+
+        taken = self.p1_cells | self.p2_cells
+        return [self.geometry.labels[cell]
+                for cell in range(len(self.geometry.labels))
+                if not taken >> cell & 1]
+
+    def get_distinct_moves(self) -> list:
+        """
+        Return all possible moves, except that of the dead cells, whose
+        ley-lines are all captured already, only the first is kept. Claiming
+        a dead cell captures nothing, and the cells left dead are alike, so
+        every dead cell scores the same as the first.
+        """
+        if self.over:
             return []
 
-        possible_moves = []
-        for row in self.cells:
-            for cell in self.cells[row]:
-                if cell.isalpha():
-                    possible_moves.append(cell)
-        return possible_moves
+        taken = self.p1_cells | self.p2_cells
+        captured = self.p1_lines | self.p2_lines
+        cell_bits = self.geometry.cell_bits
+        moves = []
+        dead = False
+        for cell in range(len(cell_bits)):
+            if taken >> cell & 1:
+                continue
+            if not cell_bits[cell] & ~captured:
+                if dead:
+                    continue
+                dead = True
+            moves.append(self.geometry.labels[cell])
+        return moves
 
     def get_current_player_name(self) -> str:
         """
@@ -351,108 +620,102 @@ class StoneHengeState(GameState):
             return 'p1'
         return 'p2'
 
+    def _play(self, move: Any) -> tuple:
+        """
+        Return the cell number of move, the cells and ley-lines the player to
+        move owns once they claim it, and the Zobrist hash that results.
+        """
+        geometry = self.geometry
+        if isinstance(move, str):
+            move = geometry.index[move]
+        if self.p1_turn:
+            player = 1
+            mine = self.p1_cells | 1 << move
+            theirs = self.p2_cells
+            captured = self.p1_lines
+        else:
+            player = 2
+            mine = self.p2_cells | 1 << move
+            theirs = self.p1_cells
+            captured = self.p2_lines
+        zobrist = self.zobrist ^ geometry.zobrist_turn ^ \
+            geometry.zobrist_cells[move][0] ^ \
+            geometry.zobrist_cells[move][player]
+
+        # only the ley-lines through move can change, and only the player
+        # who moved can capture them
+        claimed = self.p1_lines | self.p2_lines
+        for bit, mask, need, line in geometry.cell_lines[move]:
+            if not claimed & bit:
+                num_mine = count_cells(mine & mask)
+                if num_mine >= need and \
+                        num_mine > count_cells(theirs & mask):
+                    captured |= bit
+                    zobrist ^= geometry.zobrist_lines[line][player]
+        return move, mine, captured, zobrist
+
     def make_move(self, move: Any) -> 'GameState':
         """
         Return the GameState that results from applying move to this GameState.
+
+        move is the letter of a free cell, or its number on the board.
         """
-        # New state should be different from the last so you can't use
-        # self dictionaries
-        # make a copy dictionary
-        cells_new = {}
-        for i in self.cells:
-            cells_new[i] = []
-            for k in self.cells[i]:
-                cells_new[i].extend(k)
-        hlm_new = self.hlm.copy()
-        vlm_new = {}
-        for i in self.vlm:
-            vlm_new[i] = []
-            for k in self.vlm[i]:
-                vlm_new[i].extend(k)
-
-        # update cells
-        for row in cells_new:
-            for cell in cells_new[row]:
-                if move == cell:
-                    cells_new[row][cells_new[row].index(cell)] = '1' if \
-                        self.p1_turn else '2'
-        # update horizontal leyline markers
-        for row in cells_new:
-            num_1 = cells_new[row].count('1')
-            num_2 = cells_new[row].count('2')
-            if len(cells_new[row]) % 2 == 0:
-                need = len(cells_new[row]) / 2
-            else:
-                need = len(cells_new[row]) // 2 + 1
-            if hlm_new[row] == '@' and num_1 > num_2 and num_1 >= need:
-                hlm_new[row] = '1'
-            elif hlm_new[row] == '@' and num_2 > num_1 and num_2 >= need:
-                hlm_new[row] = '2'
-        # Update vertical leyline markers
-        # the one on A
-        checker = []
-        for n in range(self.board_size):
-            checker.append(cells_new['row{}'.format(n + 1)][0])
-        num_1 = checker.count('1')
-        num_2 = checker.count('2')
-        if len(checker) % 2 == 0:
-            need = len(checker) / 2
+        move, mine, captured, zobrist = self._play(move)
+        if self.p1_turn:
+            state = StoneHengeState(False, self.board_size, mine,
+                                    self.p2_cells, captured, self.p2_lines,
+                                    zobrist)
         else:
-            need = len(checker) // 2 + 1
-        if vlm_new['first2'][0] == '@' and num_1 > num_2 and num_1 >= need:
-            vlm_new['first2'][0] = '1'
-        elif vlm_new['first2'][0] == '@' and num_2 > num_1 and num_2 >= need:
-            vlm_new['first2'][0] = '2'
-        # the one on B
-        checker = []
-        for n in range(self.board_size):
-            checker.append(cells_new['row{}'.format(n + 1)][1])
-        checker.append(cells_new['row{}'.format(self.board_size + 1)][0])
-        num_1 = checker.count('1')
-        num_2 = checker.count('2')
-        if len(checker) % 2 == 0:
-            need = len(checker) / 2
+            state = StoneHengeState(True, self.board_size, self.p1_cells, mine,
+                                    self.p1_lines, captured, zobrist)
+        state.symmetries = self.symmetries
+        return state
+
+    def apply(self, move: Any) -> None:
+        """
+        Apply move to this GameState in place, so that undo() can take it
+        back.
+
+        move is the letter of a free cell, or its number on the board.
+        """
+        move, mine, captured, zobrist = self._play(move)
+        # the keys are kept too, so undo does not have to work them out again
+        if self.p1_turn:
+            self._history.append((move, captured ^ self.p1_lines,
+                                  self.zobrist, self._key, self._canonical))
+            self.p1_cells = mine
+            self.p1_lines = captured
+            self.p1_captured = count_cells(captured)
         else:
-            need = len(checker) // 2 + 1
-        if vlm_new['first2'][1] == '@' and num_1 > num_2 and num_1 >= need:
-            vlm_new['first2'][1] = '1'
-        elif vlm_new['first2'][1] == '@' and num_2 > num_1 and num_2 >= need:
-            vlm_new['first2'][1] = '2'
-        # the last n
-        last_n = last_n_lm(self.board_size, cells_new)
-        for k in last_n:
-            num_1 = last_n[k].count('1')
-            num_2 = last_n[k].count('2')
-            if len(last_n[k]) % 2 == 0:
-                need = len(last_n[k]) / 2
-            else:
-                need = len(last_n[k]) // 2 + 1
-            if vlm_new['lastn'][
-                    k - 1] == '@' and num_1 > num_2 and num_1 >= need:
-                vlm_new['lastn'][k - 1] = '1'
-            elif vlm_new['lastn'][k - 1] == '@' and num_2 > num_1 \
-                    and num_2 >= need:
-                vlm_new['lastn'][k - 1] = '2'
-
-        # the side n
-        side_n = side_n_lm(self.board_size, cells_new)
-        for k in side_n:
-            num_1 = side_n[k].count('1')
-            num_2 = side_n[k].count('2')
-            if len(side_n[k]) % 2 == 0:
-                need = len(side_n[k]) / 2
-            else:
-                need = len(side_n[k]) // 2 + 1
-            if vlm_new['siden'][
-                    k - 1] == '@' and num_1 > num_2 and num_1 >= need:
-                vlm_new['siden'][k - 1] = '1'
-            elif vlm_new['siden'][k - 1] == '@' and num_2 > num_1 and \
-                    num_2 >= need:
-                vlm_new['siden'][k - 1] = '2'
-
-        new_state = StoneHengeState(not self.p1_turn, self.board_size,
-                                    cells_new, hlm_new, vlm_new)
-        return new_state
+            self._history.append((move, captured ^ self.p2_lines,
+                                  self.zobrist, self._key, self._canonical))
+            self.p2_cells = mine
+            self.p2_lines = captured
+            self.p2_captured = count_cells(captured)
+        self.p1_turn = not self.p1_turn
+        self.zobrist = zobrist
+        self.over = max(self.p1_captured,
+                        self.p2_captured) >= self.geometry.need
+        self._key = None
+        self._canonical = None
+
+    def undo(self) -> None:
+        """
+        Take back the last move applied to this GameState by apply().
+        """
+        move, new_lines, self.zobrist, self._key, self._canonical = \
+            self._history.pop()
+        self.p1_turn = not self.p1_turn
+        if self.p1_turn:
+            self.p1_cells ^= 1 << move
+            self.p1_lines ^= new_lines
+            self.p1_captured = count_cells(self.p1_lines)
+        else:
+            self.p2_cells ^= 1 << move
+            self.p2_lines ^= new_lines
+            self.p2_captured = count_cells(self.p2_lines)
+        self.over = max(self.p1_captured,
+                        self.p2_captured) >= self.geometry.need
 
     def is_valid_move(self, move: Any) -> bool:
         """
@@ -460,6 +723,99 @@ class StoneHengeState(GameState):
         """
         return move in self.get_possible_moves()
 
+    def move_priority(self, move: Any) -> int:
+        """
+        Return the number of ley-lines the current player captures by
+        playing move.
+        """
+        captured = self._play(move)[2]
+        if self.p1_turn:
+            return count_cells(captured) - self.p1_captured
+        return count_cells(captured) - self.p2_captured
+
+    def is_terminal(self) -> bool:
+        """
+        Return whether the game is over at this GameState, which is when a
+        player has captured at least half of the ley-lines.
+        """
+        return self.over
+
+    def winner(self) -> Any:
+        """
+        Return 'p1' or 'p2' if that player has won at this GameState, or None
+        if the game is not over.
+        """
+        if self.over and self.p1_captured > self.p2_captured:
+            return 'p1'
+        elif self.over and self.p2_captured > self.p1_captured:
+            return 'p2'
+        return None
+
+    def key(self) -> tuple:
+        """
+        Return a tuple that identifies this state: equal states, however
+        they were reached, have equal keys.
+        """
+        if self._key is None:
+            self._key = (self.board_size, self.p1_turn, self.p1_cells,
+                         self.p2_cells, self.p1_lines, self.p2_lines)
+        return self._key
+
+    def canonical_key(self) -> tuple:
+        """
+        Return the smallest key of this state and its images under the
+        board symmetries in self.symmetries, which is the same for all of
+        them.
+        """
+        if not self.symmetries:
+            return self.key()
+        if self._canonical is None:
+            best = self.key()
+            symmetries = self.geometry.symmetries
+            for i in self.symmetries:
+                cells, lines = symmetries[i]
+                # most images lose on their p1 cells alone
+                p1_cells = permute(self.p1_cells, cells)
+                if p1_cells > best[2]:
+                    continue
+                key = (self.board_size, self.p1_turn, p1_cells,
+                       permute(self.p2_cells, cells),
+                       permute(self.p1_lines, lines),
+                       permute(self.p2_lines, lines))
+                if key < best:
+                    best = key
+            self._canonical = best
+        return self._canonical
+
+    def start_search(self) -> None:
+        """
+        Keep canonical_key to the symmetries that leave this state as it
+        is, for this state and the states made from it.
+        """
+        kept = []
+        for i in range(len(self.geometry.symmetries)):
+            cells, lines = self.geometry.symmetries[i]
+            if permute(self.p1_cells, cells) == self.p1_cells and \
+                    permute(self.p2_cells, cells) == self.p2_cells and \
+                    permute(self.p1_lines, lines) == self.p1_lines and \
+                    permute(self.p2_lines, lines) == self.p2_lines:
+                kept.append(i)
+        self.symmetries = kept
+        self._canonical = None
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether other is a StoneHengeState equal to this one.
+        """
+        return isinstance(other, StoneHengeState) and \
+            self.key() == other.key()
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of this state, so it can key dicts and sets.
+        """
+        return self.zobrist
+
     def __repr__(self) -> Any:
         """
         Return a representation of this state (which can be used for
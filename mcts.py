@@ -0,0 +1,269 @@
+"""
+Monte Carlo tree search (UCT) strategies, for boards too large to solve
+with minimax.
+"""
+import os
+from math import log, sqrt
+from random import Random
+from time import monotonic
+from typing import Any
+from weakref import WeakKeyDictionary
+from strategy import get_pool
+
+# playouts mcts runs for each move, when it is not given a time budget
+PLAYOUTS = 2000
+
+# how much UCT favours moves it has tried less over moves that have won
+# more; sqrt(2) is the usual choice for rewards between 0 and 1
+EXPLORATION = sqrt(2)
+
+_random = Random()
+
+
+class _Node:
+    """
+    A state in the tree of an MCTS search, reached by playing move at the
+    state of parent.
+
+    player - the player who played move, whom wins are counted for
+    children - the _Nodes of the moves tried from this state
+    untried - the moves not tried yet, or None until this state is reached
+    visits - the number of playouts through this state
+    wins - the total reward of those playouts to player: 1 for a win,
+           0.5 for a draw and 0 for a loss
+    """
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits',
+                 'wins')
+
+    def __init__(self, move: Any = None, parent: '_Node' = None,
+                 player: str = None) -> None:
+        """
+        Create a _Node for playing move at parent's state, by player.
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+
+def _select(node: _Node, exploration: float) -> _Node:
+    """
+    Return the child of node with the highest UCT value.
+    """
+    scale = exploration * sqrt(log(node.visits))
+    best = None
+    best_value = -1.0
+    for child in node.children:
+        value = child.wins / child.visits + scale / sqrt(child.visits)
+        if value > best_value:
+            best = child
+            best_value = value
+    return best
+
+
+def _rollout(state: Any, rng: Random) -> Any:
+    """
+    Play random moves from state until the game is over, and return the
+    winner, or None for a draw. state is changed in place and restored
+    before returning, and no Game is asked who won.
+    """
+    played = 0
+    while not state.is_terminal():
+        state.apply(rng.choice(state.get_possible_moves()))
+        played += 1
+    winner = state.winner()
+    for _ in range(played):
+        state.undo()
+    return winner
+
+
+def playout(root: _Node, state: Any, exploration: float = EXPLORATION,
+            rng: Random = _random) -> None:
+    """
+    Run one playout from root, whose state is state: select a path down the
+    tree by UCT, add one new node to its end, play randomly from there until
+    the game is over and count the result at every node on the path.
+
+    state is changed in place and restored before returning.
+    """
+    node = root
+    applied = 0
+    while True:
+        if node.untried is None:
+            node.untried = state.get_distinct_moves()
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            child = _Node(move, node, state.get_current_player_name())
+            node.children.append(child)
+            node = child
+            state.apply(move)
+            applied += 1
+            break
+        if not node.children:  # the game is over at node
+            break
+        node = _select(node, exploration)
+        state.apply(node.move)
+        applied += 1
+
+    winner = _rollout(state, rng)
+    while node is not None:
+        node.visits += 1
+        if winner is None:
+            node.wins += 0.5
+        elif winner == node.player:
+            node.wins += 1
+        node = node.parent
+    for _ in range(applied):
+        state.undo()
+
+
+def _find(node: _Node, state: Any, key: Any, depth: int) -> Any:
+    """
+    Return the node at most depth moves below node, whose state is state,
+    with state.key() equal to key, or None if there is none.
+    """
+    if state.key() == key:
+        return node
+    if depth > 0:
+        for child in node.children:
+            state.apply(child.move)
+            found = _find(child, state, key, depth - 1)
+            state.undo()
+            if found is not None:
+                return found
+    return None
+
+
+# the (state, root) of the last search on each game, so the next search can
+# start from the part of the tree that is still reachable
+_trees = WeakKeyDictionary()
+
+
+def get_root(game: Any) -> _Node:
+    """
+    Return the root for a search from game.current_state: the node of that
+    state in the tree of the last search on game, if it is within the two
+    moves played since, or a new root otherwise.
+    """
+    state = game.current_state
+    root = None
+    if game in _trees:
+        old_state, old_root = _trees[game]
+        root = _find(old_root, old_state, state.key(), 2)
+    if root is None:
+        root = _Node()
+    root.parent = None
+    _trees[game] = (state, root)
+    return root
+
+
+def mcts(game: Any, playouts: int = PLAYOUTS, seconds: float = None,
+         exploration: float = EXPLORATION, rng: Random = _random) -> Any:
+    """ Returns the move from game.current_state that was played through
+    most often in a Monte Carlo tree search.
+
+    The search runs playouts playouts, or if seconds is given, as many as
+    fit in that many seconds. It carries on the tree of its last search on
+    game, so the playouts of earlier moves still count.
+    """
+    root = get_root(game)
+    search(root, game.current_state, playouts, seconds, exploration, rng)
+
+    best = None
+    for child in root.children:
+        if best is None or child.visits > best.visits:
+            best = child
+    return None if best is None else best.move
+
+
+def search(root: _Node, state: Any, playouts: int = PLAYOUTS,
+           seconds: float = None, exploration: float = EXPLORATION,
+           rng: Random = _random) -> None:
+    """
+    Run playouts playouts from root, whose state is state, or if seconds is
+    given, as many as fit in that many seconds.
+    """
+    if seconds is None:
+        for _ in range(playouts):
+            playout(root, state, exploration, rng)
+    else:
+        deadline = monotonic() + seconds
+        while monotonic() < deadline:
+            playout(root, state, exploration, rng)
+
+
+def _root_visits(state: Any, playouts: int, seconds: float,
+                 exploration: float, seed: int) -> tuple:
+    """
+    Return the number of playouts run by a search from state in a worker
+    process, and the visits to each root move, as a dict.
+    """
+    root = _Node()
+    search(root, state, playouts, seconds, exploration, Random(seed))
+    return root.visits, {child.move: child.visits for child in root.children}
+
+
+def _run_workers(state: Any, workers: Any, playouts: int, seconds: float,
+                 exploration: float, rng: Random) -> tuple:
+    """
+    Return the total number of playouts run by searches from state in each
+    worker of the process pool from strategy.get_pool(workers), and the
+    visits to each root move summed over them, as a dict.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = get_pool(workers)[0]
+    share = -(-playouts // workers)
+    futures = [executor.submit(_root_visits, state, share, seconds,
+                               exploration, rng.getrandbits(32))
+               for _ in range(workers)]
+    total = 0
+    visits = {}
+    for future in futures:
+        count, root_visits = future.result()
+        total += count
+        for move in root_visits:
+            visits[move] = visits.get(move, 0) + root_visits[move]
+    return total, visits
+
+
+def parallel_mcts(game: Any, workers: int = None, playouts: int = PLAYOUTS,
+                  seconds: float = None, exploration: float = EXPLORATION,
+                  rng: Random = _random) -> Any:
+    """ Returns the move from game.current_state with the most visits,
+    summed over independent Monte Carlo tree searches in each worker of the
+    process pool from strategy.get_pool(workers).
+
+    The playouts are split evenly between the workers, or if seconds is
+    given, every worker searches for that many seconds. Unlike mcts, no tree
+    is kept between moves.
+    """
+    state = game.current_state
+    visits = _run_workers(state, workers, playouts, seconds, exploration,
+                          rng)[1]
+    best = None
+    for move in state.get_possible_moves():
+        if best is None or visits.get(move, 0) > visits.get(best, 0):
+            best = move
+    return best
+
+
+def playout_rate(state: Any, workers: int = None,
+                 seconds: float = 1.0) -> float:
+    """
+    Return the number of playouts per second parallel_mcts runs from state
+    with workers workers.
+    """
+    start = monotonic()
+    total = _run_workers(state, workers, 0, seconds, EXPLORATION,
+                         _random)[0]
+    return total / (monotonic() - start)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+
+    check_all(config="a2_pyta.txt")
@@ -0,0 +1,33 @@
+"""
+Measure the playouts per second of parallel_mcts against the number of
+workers, on empty Stonehenge boards of sizes 3 to 5.
+
+Run it with: python mcts_benchmark.py [seconds] [workers ...]
+"""
+import sys
+from game_state import StoneHengeState
+from mcts import playout_rate
+from strategy import get_pool, shutdown_pools
+
+
+def main(seconds: float, workers: list) -> None:
+    """
+    Print a table of playouts per second, searching for seconds on each
+    board with each number of workers.
+    """
+    print('size ' + ''.join('{:>10}'.format(count) for count in workers))
+    for size in range(3, 6):
+        state = StoneHengeState(True, size)
+        rates = []
+        for count in workers:
+            # start every worker before timing them
+            get_pool(count)[0].map(abs, range(count))
+            rates.append(playout_rate(state, count, seconds))
+        print('{:>4} '.format(size) +
+              ''.join('{:>10.0f}'.format(rate) for rate in rates))
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0,
+         [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8])
@@ -18,14 +18,26 @@ We will NOT test minimax on Chopsticks, and you shouldn't be using the minimax
 strategy with Chopsticks either, unless you handle repeated/looping states.
 """
 
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
+from random import Random
 import inspect
+from time import monotonic
 
 # Import the student solution
 from game_interface import playable_games, usable_strategies
+from strategy import TranspositionTable, HeuristicOrdering, \
+    iterative_deepening
+from shared_table import SharedTranspositionTable
+from mcts import get_root
+from proof_number import ProofNumberSolver, proof_number
+from tablebase import get_tablebase, MappedTablebase
 minimax_iterative_strategy = usable_strategies['mi']
 minimax_recursive_strategy = usable_strategies['mr']
+alphabeta_iterative_strategy = usable_strategies['ai']
+alphabeta_recursive_strategy = usable_strategies['ar']
 StonehengeGame = playable_games['h']
 SubtractSquareGame = playable_games['s']
 
@@ -232,5 +244,347 @@ class MinimaxUnitTests(unittest.TestCase):
                              expected_move, move_chosen, str(new_state)
                          ))
 
+    def test_recursive_table_reused_between_calls(self):
+        """
+        Test that recursive minimax keeps its solved positions between calls
+        on the same game, so a second search only hits the table.
+        """
+        with patch('builtins.input', return_value='18'):
+            game = SubtractSquareGame(True)
+
+        table = TranspositionTable()
+        minimax_recursive_strategy(game, table)
+        solved = len(table)
+        misses = table.misses
+        minimax_recursive_strategy(game, table)
+
+        self.assertEqual(len(table), solved,
+                         "A second search on the same position should not " +
+                         "solve any new positions.")
+        self.assertEqual(table.misses, misses,
+                         "A second search on the same position should only " +
+                         "find positions that are already solved.")
+        self.assertTrue(table.hits > 0)
+
+    def test_alphabeta_matches_minimax(self):
+        """
+        Test that both alpha-beta strategies choose the same moves as the
+        minimax strategies they prune.
+        """
+        for value in range(1, 20):
+            with patch('builtins.input', return_value=str(value)):
+                game = SubtractSquareGame(True)
+            self.assertEqual(alphabeta_recursive_strategy(game),
+                             minimax_recursive_strategy(game))
+            self.assertEqual(alphabeta_iterative_strategy(game),
+                             minimax_iterative_strategy(game))
+
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F', 'D']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        self.assertEqual(alphabeta_recursive_strategy(game),
+                         game.str_to_move('E'))
+        self.assertEqual(alphabeta_iterative_strategy(game),
+                         game.str_to_move('E'))
+
+    def test_iterative_deepening_winning_moves(self):
+        """
+        Test that iterative deepening finds the winning moves on the boards
+        used above, well within its time budget.
+        """
+        with patch('builtins.input', return_value='3'):
+            game = StonehengeGame(True)
+        for move in ['A', 'C', 'B', 'F', 'E', 'G', 'D', 'I']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        self.assertIn(usable_strategies['id'](game),
+                      [game.str_to_move("H"), game.str_to_move("K")])
+
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F', 'D']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        self.assertEqual(usable_strategies['id'](game), game.str_to_move('E'))
+
+    def test_heuristic_ordering(self):
+        """
+        Test that the heuristic ordering tries capturing moves and large
+        squares first, and killer moves before those.
+        """
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F', 'D']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        state = game.current_state
+        ordering = HeuristicOrdering()
+        moves = ordering.order(state, state.get_possible_moves(), 1)
+        self.assertEqual(sorted(moves), sorted(state.get_possible_moves()))
+        self.assertTrue(state.move_priority(moves[0]) > 0)
+
+        with patch('builtins.input', return_value='18'):
+            game = SubtractSquareGame(True)
+        state = game.current_state
+        self.assertEqual(ordering.order(state, state.get_possible_moves(), 1),
+                         [16, 9, 4, 1])
+        ordering.cutoff(4, 1)
+        self.assertEqual(ordering.order(state, state.get_possible_moves(), 1),
+                         [4, 16, 9, 1])
+
+    def test_parallel_alphabeta_matches_recursive(self):
+        """
+        Test that the parallel strategy chooses the same moves as recursive
+        alpha-beta, with a pool that is reused between calls.
+        """
+        parallel_strategy = usable_strategies['pa']
+        for value in [4, 7, 18]:
+            with patch('builtins.input', return_value=str(value)):
+                game = SubtractSquareGame(True)
+            self.assertEqual(parallel_strategy(game, 2),
+                             alphabeta_recursive_strategy(game))
+
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F', 'D']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        self.assertEqual(parallel_strategy(game, 2), game.str_to_move('E'))
+
+    def test_shared_table_store_and_attach(self):
+        """
+        Test that a SharedTranspositionTable keeps scores and bounds, and
+        that a table attached by name sees what the first one stored.
+        """
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        state = game.current_state
+        child = state.make_move('A')
+        table = SharedTranspositionTable(64)
+        try:
+            table.store(state, -1, 2)
+            table.store(child, 1)
+            attached = SharedTranspositionTable(name=table.name)
+            self.assertEqual(attached.lookup(state), (-1, 2))
+            self.assertEqual(attached.lookup(child), (1, 0))
+            self.assertIsNone(attached.lookup(child.make_move('B')))
+            self.assertEqual(len(attached), 2)
+            attached.close()
+        finally:
+            table.close()
+
+    def test_mcts_winning_moves_and_reuse(self):
+        """
+        Test that MCTS finds the winning moves on small boards, and that its
+        next search on the same game starts from the tree it built.
+        """
+        mcts_strategy = usable_strategies['mc']
+        with patch('builtins.input', return_value='18'):
+            game = SubtractSquareGame(True)
+        self.assertIn(mcts_strategy(game, rng=Random(0)), [1, 16])
+
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        mcts_strategy(game, rng=Random(0))
+        game.current_state = game.current_state.make_move('D')
+        self.assertTrue(get_root(game).visits > 0)
+        self.assertEqual(mcts_strategy(game, rng=Random(0)),
+                         game.str_to_move('E'))
+        self.assertEqual(usable_strategies['pm'](game, 2, rng=Random(0)),
+                         game.str_to_move('E'))
+
+    def test_proof_number_solver(self):
+        """
+        Test that the proof-number solver proves wins with a winning move,
+        proves losses, and gives up when its node or time budget runs out.
+        """
+        with patch('builtins.input', return_value='18'):
+            game = SubtractSquareGame(True)
+        result, move = ProofNumberSolver().solve(game.current_state)
+        self.assertEqual(result, 1)
+        self.assertIn(move, [1, 16])
+        self.assertIn(usable_strategies['pn'](game), [1, 16])
+
+        with patch('builtins.input', return_value='2'):
+            game = SubtractSquareGame(True)
+        self.assertEqual(ProofNumberSolver().solve(game.current_state),
+                         (-1, None))
+
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        for move in ['A', 'F', 'D']:
+            game.current_state = game.current_state.make_move(
+                game.str_to_move(move))
+        self.assertEqual(ProofNumberSolver().solve(game.current_state),
+                         (1, game.str_to_move('E')))
+        self.assertEqual(ProofNumberSolver(1).solve(game.current_state),
+                         (None, None))
+
+        # a board too large to solve in time falls back to iterative
+        # deepening within the same time
+        with patch('builtins.input', return_value='5'):
+            game = StonehengeGame(True)
+        start = monotonic()
+        move = proof_number(game, 0.5)
+        self.assertLess(monotonic() - start, 0.75)
+        self.assertIn(move, game.current_state.get_possible_moves())
+
+    def test_iterative_deepening_time_limit(self):
+        """
+        Test that iterative deepening keeps to its time budget on a board
+        where even the first, one move deep, search does not finish in time.
+        """
+        with patch('builtins.input', return_value='8'):
+            game = StonehengeGame(True)
+        start = monotonic()
+        move = iterative_deepening(game, 0.5)
+        self.assertLess(monotonic() - start, 0.75)
+        self.assertIn(move, game.current_state.get_possible_moves())
+
+    def test_tablebase_matches_minimax(self):
+        """
+        Test that the tablebase strategy chooses the same moves as recursive
+        minimax, and scores positions the same, on a size 2 board.
+        """
+        with patch('builtins.input', return_value='2'):
+            game = StonehengeGame(True)
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('tablebase.TABLEBASE_DIR', directory), \
+                patch.dict('tablebase._tablebases', clear=True):
+            table = get_tablebase(2)
+            for move in ['A', 'F', 'D']:
+                self.assertEqual(usable_strategies['tb'](game),
+                                 minimax_recursive_strategy(game))
+                game.current_state = game.current_state.make_move(
+                    game.str_to_move(move))
+            self.assertEqual(usable_strategies['tb'](game),
+                             game.str_to_move('E'))
+        self.assertEqual(table.value(game.current_state), 1)
+        self.assertEqual(table.value(game.current_state.make_move('B')), 1)
+
+    def test_tablebase_file_round_trip(self):
+        """
+        Test that a tablebase written to a file and mapped back in gives
+        the same values and moves, with and without the best move bytes.
+        """
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('tablebase.TABLEBASE_DIR', directory), \
+                patch.dict('tablebase._tablebases', clear=True):
+            table = get_tablebase(2)
+            for moves in [True, False]:
+                path = os.path.join(directory, 'stonehenge2.tb')
+                table.write(path, moves)
+                mapped = MappedTablebase(path)
+                for rank in range(len(table.ranking)):
+                    self.assertEqual(mapped.value_at(rank),
+                                     table.value_at(rank))
+                with patch('builtins.input', return_value='2'):
+                    game = StonehengeGame(True)
+                for move in ['A', 'F', 'D']:
+                    game.current_state = game.current_state.make_move(move)
+                    self.assertEqual(mapped.best_move(game.current_state),
+                                     table.best_move(game.current_state))
+
+    def test_tablebase_saved_and_mapped(self):
+        """
+        Test that get_tablebase saves what it solves, making the directory
+        if there is none, so the next process to ask maps the file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            directory = os.path.join(directory, 'tablebases')
+            with patch('tablebase.TABLEBASE_DIR', directory), \
+                    patch.dict('tablebase._tablebases', clear=True):
+                solved = get_tablebase(2)
+                self.assertNotIsInstance(solved, MappedTablebase)
+                self.assertEqual(os.listdir(directory), ['stonehenge2.tb'])
+                # a fresh cache, as in another process
+                with patch.dict('tablebase._tablebases', clear=True):
+                    mapped = get_tablebase(2)
+                self.assertIsInstance(mapped, MappedTablebase)
+                self.assertEqual(mapped.value_at(0), solved.value_at(0))
+
+    def test_stonehenge_incremental_zobrist(self):
+        """
+        Test that the Zobrist hash make_move updates matches the one
+        computed from scratch, over random games on several board sizes,
+        and that the same position reached in another order hashes the
+        same.
+        """
+        rng = Random(9)
+        for size in range(1, 6):
+            with patch('builtins.input', return_value=str(size)):
+                game = StonehengeGame(True)
+            for _ in range(5):
+                state = game.current_state
+                while not state.is_terminal():
+                    state = state.make_move(
+                        rng.choice(state.get_possible_moves()))
+                    self.assertEqual(state.zobrist, state._zobrist())
+
+        with patch('builtins.input', return_value='3'):
+            start = StonehengeGame(True).current_state
+        states = []
+        for moves in [["A", "B", "C", "D"], ["C", "D", "A", "B"]]:
+            state = start
+            for move in moves:
+                state = state.make_move(move)
+            states.append(state)
+        self.assertEqual(states[0].key(), states[1].key())
+        self.assertEqual(states[0].zobrist, states[1].zobrist)
+        self.assertEqual(hash(states[0]), hash(states[1]))
+
+    def test_apply_undo_round_trip(self):
+        """
+        Test that applying a random sequence of moves gives the same states
+        as make_move, and that undoing them restores every earlier state,
+        for both games.
+        """
+        def snapshot(state):
+            return (state.key(), state.canonical_key(), state.p1_turn,
+                    getattr(state, 'zobrist', None),
+                    getattr(state, 'over', None),
+                    getattr(state, 'p1_captured', None),
+                    getattr(state, 'p2_captured', None))
+
+        rng = Random(4)
+        for game_class, value in [(StonehengeGame, '3'),
+                                  (StonehengeGame, '4'),
+                                  (SubtractSquareGame, '60')]:
+            with patch('builtins.input', return_value=value):
+                game = game_class(True)
+            for _ in range(5):
+                state = game.current_state
+                made = state
+                snapshots = []
+                while not state.is_terminal():
+                    snapshots.append(snapshot(state))
+                    move = rng.choice(state.get_possible_moves())
+                    made = made.make_move(move)
+                    state.apply(move)
+                    self.assertEqual(snapshot(state), snapshot(made))
+                while snapshots:
+                    state.undo()
+                    self.assertEqual(snapshot(state), snapshots.pop())
+
+    def test_subtract_square_large_totals(self):
+        """
+        Test the moves and rough outcomes of SubtractSquare totals in the
+        millions.
+        """
+        with patch('builtins.input', return_value='2000000'):
+            state = SubtractSquareGame(True).current_state
+        moves = state.get_possible_moves()
+        self.assertEqual(len(moves), 1414)
+        self.assertEqual(moves[:3], [1, 4, 9])
+        self.assertEqual(moves[-1], 1414 ** 2)
+        self.assertEqual(state.rough_outcome(), state.DRAW)
+        state = state.make_move(str(2000000 - 1414 ** 2))
+        self.assertEqual(state.rough_outcome(), state.WIN)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,230 @@
+"""
+A depth-first proof-number (df-pn) solver, for asking whether a position
+is won, lost or drawn without finding its exact minimax score.
+"""
+from time import monotonic
+from typing import Any
+from weakref import WeakKeyDictionary
+from game_state import GameState
+from strategy import TIME_LIMIT, iterative_deepening
+
+# a proof or disproof number that can never be reached: the question is
+# settled the other way
+INFINITY = 10 ** 9
+
+# solve() stops after searching this many nodes
+NODE_BUDGET = 1000000
+
+# how many nodes are searched between reads of the clock, when solve() is
+# given a time budget
+CLOCK_NODES = 64
+
+
+class _OutOfNodes(Exception):
+    """
+    Raised inside a search when its node or time budget is spent.
+    """
+
+
+class ProofNumberSolver:
+    """
+    Answers whether the player to move at a state wins, loses or draws, by
+    df-pn search.
+
+    Each search proves or disproves that one player, the attacker, wins.
+    Its table maps state.canonical_key() to the (proof, disproof) numbers
+    found for the state: the least number of leaves that still have to be
+    shown to be wins for the attacker to prove it, or not wins to disprove
+    it.
+
+    budget - the number of nodes a call to solve may search
+    nodes - the number of nodes searched so far
+    tables - the table of each attacker, 'p1' and 'p2', kept between calls
+    """
+
+    def __init__(self, budget: int = NODE_BUDGET) -> None:
+        """
+        Create a ProofNumberSolver that searches at most budget nodes for
+        each call to solve.
+        """
+        self.budget = budget
+        self.nodes = 0
+        self.tables = {'p1': {}, 'p2': {}}
+        self._deadline = None
+
+    def solve(self, state: Any, seconds: float = None) -> tuple:
+        """
+        Return (result, move) for the player to move at state, where result
+        is GameState.WIN, LOSE or DRAW, and move wins, or else draws, if
+        there is such a move. result is None if the budget, or seconds if
+        they are given, ran out first.
+
+        state is searched in place with apply and undo, and restored.
+        """
+        self._deadline = None if seconds is None else monotonic() + seconds
+        player = state.get_current_player_name()
+        other = 'p2' if player == 'p1' else 'p1'
+        state.start_search()
+        limit = self.nodes + self.budget
+        try:
+            if self._prove(state, player, limit):
+                return GameState.WIN, self._best_move(state, player, 0)
+            if self._prove(state, other, limit):
+                return GameState.LOSE, None
+        except _OutOfNodes:
+            return None, None
+        return GameState.DRAW, self._best_move(state, other, 1)
+
+    def _prove(self, state: Any, attacker: str, limit: int) -> bool:
+        """
+        Return whether attacker wins from state, searching until the node
+        count reaches limit.
+        """
+        proof = self._search(state, attacker, INFINITY, INFINITY, limit)[0]
+        return proof == 0
+
+    def _numbers(self, state: Any, attacker: str) -> tuple:
+        """
+        Return the (proof, disproof) numbers of state for attacker, as far
+        as they are known.
+        """
+        table = self.tables[attacker]
+        key = state.canonical_key()
+        if key not in table:
+            if state.is_terminal():
+                if state.winner() == attacker:
+                    table[key] = (0, INFINITY)
+                else:
+                    table[key] = (INFINITY, 0)
+            else:
+                return 1, 1
+        return table[key]
+
+    def _children(self, state: Any, attacker: str, moves: list) -> list:
+        """
+        Return the (proof, disproof) numbers of playing each of moves at
+        state, for attacker.
+        """
+        numbers = []
+        for move in moves:
+            state.apply(move)
+            numbers.append(self._numbers(state, attacker))
+            state.undo()
+        return numbers
+
+    def _search(self, state: Any, attacker: str, proof_limit: int,
+                disproof_limit: int, limit: int) -> tuple:
+        """
+        Search below state until its proof number reaches proof_limit or
+        its disproof number reaches disproof_limit, and return both.
+        """
+        numbers = self._numbers(state, attacker)
+        if 0 in numbers:
+            return numbers
+        self.nodes += 1
+        if self.nodes > limit:
+            raise _OutOfNodes
+        if self._deadline is not None and self.nodes % CLOCK_NODES == 0 \
+                and monotonic() > self._deadline:
+            raise _OutOfNodes
+        moves = state.get_distinct_moves()
+        attacking = state.get_current_player_name() == attacker
+        children = self._children(state, attacker, moves)
+        while True:
+            if attacking:
+                # the attacker needs one child to be a win
+                proof, disproof = _combine(children, 0, 1)
+            else:
+                # the attacker needs every child to be a win
+                disproof, proof = _combine(children, 1, 0)
+            if proof >= proof_limit or disproof >= disproof_limit:
+                break
+            side = 0 if attacking else 1
+            best, second = _two_smallest(children, side)
+            if attacking:
+                child_limits = (min(proof_limit, second + 1),
+                                disproof_limit - disproof +
+                                children[best][1])
+            else:
+                child_limits = (proof_limit - proof + children[best][0],
+                                min(disproof_limit, second + 1))
+            state.apply(moves[best])
+            try:
+                children[best] = self._search(state, attacker,
+                                              child_limits[0],
+                                              child_limits[1], limit)
+            finally:
+                state.undo()
+        self.tables[attacker][state.canonical_key()] = proof, disproof
+        return proof, disproof
+
+    def _best_move(self, state: Any, attacker: str, side: int) -> Any:
+        """
+        Return the move at state whose proof (side 0) or disproof (side 1)
+        number for attacker is 0, once state is solved.
+        """
+        moves = state.get_distinct_moves()
+        children = self._children(state, attacker, moves)
+        for i in range(len(moves)):
+            if children[i][side] == 0:
+                return moves[i]
+        return None
+
+
+def _combine(children: list, least: int, total: int) -> tuple:
+    """
+    Return the smallest of the children's numbers at index least, and the
+    sum of those at index total, capped at INFINITY.
+    """
+    smallest = INFINITY
+    added = 0
+    for child in children:
+        smallest = min(smallest, child[least])
+        added = min(INFINITY, added + child[total])
+    return smallest, added
+
+
+def _two_smallest(children: list, side: int) -> tuple:
+    """
+    Return the index of the child with the smallest number at index side,
+    and the second smallest number there.
+    """
+    best = 0
+    second = INFINITY
+    for i in range(1, len(children)):
+        if children[i][side] < children[best][side]:
+            second = children[best][side]
+            best = i
+        else:
+            second = min(second, children[i][side])
+    return best, second
+
+
+# one solver per game, so consecutive moves in a game share solved positions
+_solvers = WeakKeyDictionary()
+
+
+def proof_number(game: Any, seconds: float = TIME_LIMIT) -> Any:
+    """ Returns a move that wins from game.current_state, or else one that
+    draws, as proven by a ProofNumberSolver. If the player to move loses
+    anyway, returns the first possible move.
+
+    The solver gets half of seconds. If it cannot solve the state in that
+    time, the rest goes to iterative_deepening.
+    """
+    if game not in _solvers:
+        _solvers[game] = ProofNumberSolver()
+    state = game.current_state
+    start = monotonic()
+    result, move = _solvers[game].solve(state, seconds / 2)
+    if result is None:
+        return iterative_deepening(game, seconds - (monotonic() - start))
+    if move is None:
+        move = state.get_possible_moves()[0]
+    return move
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+
+    check_all(config="a2_pyta.txt")
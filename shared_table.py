@@ -0,0 +1,130 @@
+"""
+A transposition table that worker processes share through shared memory.
+"""
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+# bytes in one slot: a 64-bit check word and a 64-bit data word
+SLOT_SIZE = 16
+
+# slots tried after the one a key hashes to before a store replaces one
+PROBES = 4
+
+# set in the data word of every used slot, so an empty slot reads as 0
+_USED = 16
+
+_MASK = (1 << 64) - 1
+
+
+class SharedTranspositionTable:
+    """
+    A fixed size, open addressing table of solved positions, laid out in a
+    SharedMemory block that every process attached to it reads and writes
+    directly, without locks or a manager process.
+
+    Each slot is two 64-bit words: the data, packing a score of -1, 0 or 1
+    and its bound, and a check word, the 64-bit hash of the state's key xor
+    the data. A slot torn by two processes writing it at once fails the
+    check and reads as a miss, so the only cost of not locking is a lost
+    entry.
+
+    It has the lookup and store of strategy.TranspositionTable, keyed on
+    the hash of state.canonical_key(), so symmetric positions share a slot.
+    Stonehenge and SubtractSquare keys are tuples of ints and bools, which
+    hash the same in every process.
+
+    name - the name of the SharedMemory block, to attach other processes
+    capacity - the number of slots
+    hits - number of lookups by this process that found a solved state
+    misses - number of lookups by this process that did not
+    """
+
+    def __init__(self, capacity: int = 1 << 20, name: str = None) -> None:
+        """
+        Create a SharedTranspositionTable with capacity slots, or attach to
+        the existing one called name.
+        """
+        if name is None:
+            self._memory = SharedMemory(create=True,
+                                        size=capacity * SLOT_SIZE)
+        else:
+            self._memory = SharedMemory(name)
+        self._owner = name is None
+        self.name = self._memory.name
+        self.capacity = self._memory.size // SLOT_SIZE
+        self._words = self._memory.buf.cast('Q')
+        self.hits = 0
+        self.misses = 0
+
+    def __reduce__(self) -> tuple:
+        """
+        Pickle only the name, so an unpickled table attaches to this one.
+        """
+        return SharedTranspositionTable, (self.capacity, self.name)
+
+    def __len__(self) -> int:
+        """
+        Return the number of used slots.
+        """
+        words = self._words
+        return sum(1 for i in range(1, len(words), 2) if words[i])
+
+    def _find(self, key: int) -> int:
+        """
+        Return the data word of the slot holding key, or 0 if no slot
+        holds it.
+        """
+        words = self._words
+        slot = key % self.capacity
+        for _ in range(PROBES):
+            data = words[2 * slot + 1]
+            if not data:
+                return 0
+            if words[2 * slot] ^ data == key:
+                return data
+            slot = (slot + 1) % self.capacity
+        return 0
+
+    def lookup(self, state: Any) -> Any:
+        """
+        Return the stored (score, bound) of state, or None if state is not
+        solved yet.
+        """
+        data = self._find(hash(state.canonical_key()) & _MASK)
+        if not data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (data & 3) - 1, data >> 2 & 3
+
+    def store(self, state: Any, score: int, bound: int = 0) -> None:
+        """
+        Record that the player to move at state can guarantee score, where
+        bound is one of strategy's EXACT, LOWER or UPPER.
+
+        If the slots state probes are all holding other states, the first
+        one is replaced.
+        """
+        key = hash(state.canonical_key()) & _MASK
+        words = self._words
+        slot = key % self.capacity
+        target = slot
+        for _ in range(PROBES):
+            data = words[2 * slot + 1]
+            if not data or words[2 * slot] ^ data == key:
+                target = slot
+                break
+            slot = (slot + 1) % self.capacity
+        data = _USED | bound << 2 | score + 1
+        words[2 * target + 1] = data
+        words[2 * target] = key ^ data
+
+    def close(self) -> None:
+        """
+        Detach this process from the table, and free the table if this
+        process created it.
+        """
+        self._words.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
@@ -16,6 +16,7 @@ from unittest.mock import patch
 
 # Import the student solution
 from game_interface import playable_games
+from tablebase import PositionRanking
 StonehengeGame = playable_games['h']
 
 # Below are some sample Stonehenge boards for use in the unittests
@@ -739,6 +740,115 @@ class StonehengeUnitTests(unittest.TestCase):
                           " all moves will result in states where the other " +
                           "player can immediately win but {} was returned " + 
                           "instead.").format(ro))
-        
+
+    @patch('builtins.input', side_effect = ['1'])
+    def test_stonehenge_terminal_and_winner(self, input):
+        """
+        Test is_terminal() and winner() on states before and after p1
+        captures enough ley-lines to win.
+        """
+        game = StonehengeGame(True)
+        self.assertFalse(game.current_state.is_terminal())
+        self.assertIsNone(game.current_state.winner())
+
+        new_state = game.current_state.make_move(game.str_to_move("A"))
+        self.assertTrue(new_state.is_terminal())
+        self.assertEqual(new_state.winner(), 'p1')
+
+    @patch('builtins.input', side_effect = ['2'])
+    def test_stonehenge_eq_hash_same_value(self, input):
+        """
+        Test that states with the same cells and current player compare equal
+        and hash the same, however they were reached.
+        """
+        game = StonehengeGame(True)
+        state_1 = game.current_state
+        state_2 = game.current_state
+        for move in ["A", "G", "B"]:
+            state_1 = state_1.make_move(game.str_to_move(move))
+        for move in ["B", "G", "A"]:
+            state_2 = state_2.make_move(game.str_to_move(move))
+
+        self.assertEqual(state_1, state_2)
+        self.assertEqual(hash(state_1), hash(state_2))
+        self.assertEqual(len({state_1, state_2}), 1)
+        self.assertNotEqual(state_1, state_1.make_move("D"))
+
+    def test_stonehenge_large_board_ley_lines(self):
+        """
+        Test that boards bigger than 5 have 3 ley-lines through every cell,
+        and name the cells past Z with two letters.
+        """
+        for size in range(1, 9):
+            with patch('builtins.input', return_value=str(size)):
+                game = StonehengeGame(True)
+            ley_lines, cells = self.extract_stonehenge_values(
+                game.current_state)
+            self.assertEqual(len(ley_lines), 3 * (size + 1))
+            self.assertEqual(len(cells), (size * size + 5 * size) // 2)
+            self.assertEqual(cells, game.current_state.get_possible_moves())
+            for cell_lines in game.current_state.geometry.cell_lines:
+                self.assertEqual(len(cell_lines), 3)
+
+        self.assertEqual(cells[26:28], ['AA', 'AB'])
+
+    @patch('builtins.input', side_effect = ['2'])
+    def test_stonehenge_rank_unrank(self, input):
+        """
+        Test that every rank of a size 2 board unranks to a state that ranks
+        back to it, and that states reached by play unrank to themselves.
+        """
+        ranking = PositionRanking(2)
+        for rank in range(len(ranking)):
+            self.assertEqual(ranking.rank(*ranking.unrank(rank)), rank)
+
+        state = StonehengeGame(True).current_state
+        for move in ["A", "F", "D", "E"]:
+            rank = ranking.rank_state(state)
+            self.assertTrue(0 <= rank < len(ranking))
+            self.assertEqual(ranking.unrank_state(rank, state.p1_turn), state)
+            state = state.make_move(move)
+
+    @patch('builtins.input', side_effect = ['3'])
+    def test_stonehenge_canonical_key(self, input):
+        """
+        Test that the corner cells of a size 3 board give states with the
+        same canonical key, and that a middle cell does not, and that
+        start_search keeps only the symmetries of the state it is called on.
+        """
+        state = StonehengeGame(True).current_state
+        corners = [state.make_move(move).canonical_key()
+                   for move in ["A", "B", "F", "I", "J", "L"]]
+        self.assertEqual(len(state.geometry.symmetries), 5)
+        self.assertEqual(len(set(corners)), 1)
+        self.assertNotEqual(corners[0], state.make_move("E").canonical_key())
+
+        # a search from D can only meet the twins given by the one symmetry
+        # that leaves D alone, and a search from D and A meets none
+        state = state.make_move("D")
+        state.start_search()
+        self.assertEqual(len(state.symmetries), 1)
+        self.assertEqual(state.make_move("C").canonical_key(),
+                         state.make_move("E").canonical_key())
+        state = state.make_move("A")
+        state.start_search()
+        self.assertEqual(state.symmetries, [])
+        self.assertEqual(state.canonical_key(), state.key())
+
+    @patch('builtins.input', side_effect = ['3'])
+    def test_stonehenge_dead_cells(self, input):
+        """
+        Test that get_distinct_moves keeps only the first of the cells whose
+        ley-lines are all captured, and that claiming them captures nothing.
+        """
+        state = StonehengeGame(True).current_state
+        for move in ["C", "I", "H", "G", "L", "J", "D", "E", "A"]:
+            state = state.make_move(move)
+        self.assertEqual(state.get_possible_moves(), ["B", "F", "K"])
+        self.assertEqual(state.get_distinct_moves(), ["B", "K"])
+        for move in ["B", "F"]:
+            self.assertEqual(state.make_move(move).p2_lines, state.p2_lines)
+
+
 if __name__ == "__main__":
     unittest.main()
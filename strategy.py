@@ -5,15 +5,22 @@ NOTE: Make sure this file adheres to python-ta.
 Adjust the type annotations as needed, and implement both a recursive
 and an iterative version of minimax.
 """
-from copy import deepcopy
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Array
+from time import monotonic
 from typing import Any
+from weakref import WeakKeyDictionary
 from game import Game
+from shared_table import SharedTranspositionTable
 
 
 class Stack:
     """
     Last-in, first-out (LIFO) stack.
     """
+    __slots__ = ('_contents',)
 
     def __init__(self) -> None:
         """
@@ -75,6 +82,174 @@ class Tree:
         self.children = children[:] if children is not None else []
         self.move = m
 
+
+# bounds stored with each score in a TranspositionTable: the score is exact,
+# or the true score is at least (LOWER) or at most (UPPER) the stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    """
+    A table of solved positions, mapping each game state to the score the
+    player to move can guarantee from it and the bound that score is.
+
+    Positions are keyed on state.canonical_key(), so symmetric positions
+    share an entry, and so a state that a search changes
+    in place with apply() and undo() can still be looked up and stored.
+
+    hits - number of lookups that found a solved state
+    misses - number of lookups that did not
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a new, empty TranspositionTable self.
+
+        >>> t = TranspositionTable()
+        >>> len(t)
+        0
+        """
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of states solved in TranspositionTable self.
+        """
+        return len(self._entries)
+
+    def lookup(self, state: Any) -> Any:
+        """
+        Return the stored (score, bound) of state, or None if state is not
+        solved yet.
+        """
+        entry = self._entries.get(state.canonical_key())
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, state: Any, score: int, bound: int = EXACT) -> None:
+        """
+        Record that the player to move at state can guarantee score, where
+        bound is one of EXACT, LOWER or UPPER.
+        """
+        self._entries[state.canonical_key()] = (score, bound)
+
+
+# one table per game, so consecutive moves in a game share solved positions
+_tables = WeakKeyDictionary()
+
+
+def get_table(game: Any) -> TranspositionTable:
+    """
+    Return the TranspositionTable shared by every search on game.
+    """
+    if game not in _tables:
+        _tables[game] = TranspositionTable()
+    return _tables[game]
+
+
+class MoveOrdering:
+    """
+    Decides the order a search tries the moves of a state in.
+
+    This base ordering keeps the order of get_possible_moves; subclasses
+    put the moves most likely to be best first, so alpha-beta cuts off
+    sooner. The search reports back through best() and cutoff().
+    """
+
+    def order(self, state: Any, moves: list, ply: int) -> list:
+        """
+        Return moves, the moves of state ply moves below the root of the
+        search, in the order to search them.
+        """
+        return moves
+
+    def best(self, state: Any, move: Any) -> None:
+        """
+        Record that move was the best move found at state.
+        """
+
+    def cutoff(self, move: Any, ply: int, weight: int = 1) -> None:
+        """
+        Record that move, ply moves below the root, was good enough that
+        the rest of its state's moves were skipped. weight is larger for
+        cutoffs that skipped more of the tree.
+        """
+
+
+class HeuristicOrdering(MoveOrdering):
+    """
+    Orders moves by, in turn: the best move found at the state before,
+    the killer moves of the ply, the state's move_priority of the move,
+    and the move's history score.
+
+    best_moves - the best move found at each state, by state.key()
+    killers - the last two moves at each ply that caused a cutoff
+    history - the total weight of the cutoffs each move has caused
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a HeuristicOrdering that has not seen any searches yet.
+        """
+        self.best_moves = {}
+        self.killers = {}
+        self.history = {}
+
+    def order(self, state: Any, moves: list, ply: int) -> list:
+        """
+        Return moves, the moves of state ply moves below the root of the
+        search, in the order to search them.
+        """
+        first = self.best_moves.get(state.key())
+        killers = self.killers.get(ply, ())
+        history = self.history
+        return sorted(moves, reverse=True,
+                      key=lambda move: (move == first, move in killers,
+                                        state.move_priority(move),
+                                        history.get(move, 0)))
+
+    def best(self, state: Any, move: Any) -> None:
+        """
+        Record that move was the best move found at state.
+        """
+        self.best_moves[state.key()] = move
+
+    def cutoff(self, move: Any, ply: int, weight: int = 1) -> None:
+        """
+        Record that move, ply moves below the root, was good enough that
+        the rest of its state's moves were skipped. weight is larger for
+        cutoffs that skipped more of the tree.
+        """
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + weight
+
+
+def distinct_moves(state: Any) -> list:
+    """
+    Return the distinct moves of state, also leaving out every move that
+    leads to a position symmetric to one an earlier move leads to, as it
+    scores the same. The first move of each such group is kept, so the
+    first best move is still found.
+    """
+    moves = []
+    seen = set()
+    for move in state.get_distinct_moves():
+        key = state.make_move(move).canonical_key()
+        if key not in seen:
+            seen.add(key)
+            moves.append(move)
+    return moves
+
 # TODO: Adjust the type annotation as needed.
 
 
@@ -88,90 +263,530 @@ def interactive_strategy(game: Any) -> Any:
 # TODO: Implement a recursive version of the minimax strategy.
 
 
-def helper(game):
-    """"helper function for recursive minimax"""
+def _terminal_score(state: Any) -> int:
+    """
+    Return the score of the player to move at state, where the game is over.
+    """
+    winner = state.winner()
+    if winner is None:
+        return 0
+    elif winner == state.get_current_player_name():
+        return 1
+    return -1
+
+
+def helper(state, table=None):
+    """"helper function for recursive minimax
+
+    The search walks state itself with apply and undo, and leaves it as it
+    was found.
+    """
+    if table is not None:
+        entry = table.lookup(state)
+        if entry is not None and entry[1] == EXACT:
+            return entry[0]
     best_score = -2
-    game_copy = deepcopy(game)  # make a copy of the game
-    if game_copy.is_over(game_copy.current_state):  # base case
-        if game_copy.is_winner(
-                game_copy.current_state.get_current_player_name()):
-            return 1
-        elif not game_copy.is_winner('p1') and not game_copy.is_winner('p2'):
-            return 0
-
-        return -1
+    if state.is_terminal():  # base case
+        best_score = _terminal_score(state)
     else:
-        moves = game_copy.current_state.get_possible_moves()
-        for move in moves:
-            game_copy_1 = deepcopy(game_copy)
-            game_copy_1.current_state = game_copy_1.current_state.make_move(
-                move)
-            score = helper(game_copy_1) * -1
+        for move in state.get_distinct_moves():
+            state.apply(move)
+            score = helper(state, table) * -1
+            state.undo()
             if score > best_score:
                 best_score = score
 
-        return best_score
+    if table is not None:
+        table.store(state, best_score)
+    return best_score
+
 
+def recursive_minimax(game: Game, table: TranspositionTable = None):
+    """ Returns a move that maximises the chances of winning
 
-def recursive_minimax(game: Game):
-    """ Returns a move that maximises the chances of winning"""
-    moves = game.current_state.get_possible_moves()
+    Solved positions are kept in table, which defaults to the table shared
+    by every search on game.
+    """
+    if table is None:
+        table = get_table(game)
+    state = game.current_state
+    state.start_search()
     best_score = -2
-    for move in moves:
-        weiran = deepcopy(game)
-        weiran.current_state = weiran.current_state.make_move(move)
-        score = helper(weiran) * -1
+    for move in distinct_moves(state):
+        score = helper(state.make_move(move), table) * -1
         if score > best_score:
             best_score = score
             score_move_tup = (best_score, move)
     return score_move_tup[1]
 
+
+def _probe(table: TranspositionTable, state: Any, alpha: int,
+           beta: int) -> Any:
+    """
+    Return the score stored for state in table if it decides the search
+    window (alpha, beta), or None if state still has to be searched.
+    """
+    entry = table.lookup(state)
+    if entry is None:
+        return None
+    score, bound = entry
+    if bound == EXACT or (bound == LOWER and score >= beta) or \
+            (bound == UPPER and score <= alpha):
+        return score
+    return None
+
+
+def _bound(score: int, alpha: int, beta: int) -> int:
+    """
+    Return the bound of a score found by searching with window (alpha, beta).
+    """
+    if score <= alpha:
+        return UPPER
+    elif score >= beta:
+        return LOWER
+    return EXACT
+
+
+def alphabeta_helper(state, alpha, beta, table, ordering=None, ply=1):
+    """helper function for recursive alpha-beta minimax
+
+    Return the score of the player to move at state if it lies strictly
+    between alpha and beta, or otherwise a bound on the side of the window
+    it falls. Like helper, this walks state itself with apply and undo.
+    Moves are searched in the order given by ordering, which is ply moves
+    from the root.
+    """
+    if ordering is None:
+        ordering = MoveOrdering()
+    score = _probe(table, state, alpha, beta)
+    if score is not None:
+        return score
+    if state.is_terminal():
+        best_score = _terminal_score(state)
+        table.store(state, best_score)
+        return best_score
+
+    best_score = -2
+    best_move = None
+    window = alpha
+    for move in ordering.order(state, state.get_distinct_moves(), ply):
+        state.apply(move)
+        score = alphabeta_helper(state, -beta, -window, table, ordering,
+                                 ply + 1) * -1
+        state.undo()
+        if score > best_score:
+            best_score = score
+            best_move = move
+            window = max(window, score)
+            if window >= beta:  # the opponent will not allow this line
+                ordering.cutoff(move, ply)
+                break
+
+    ordering.best(state, best_move)
+    table.store(state, best_score, _bound(best_score, alpha, beta))
+    return best_score
+
+
+def recursive_alphabeta(game: Game, table: TranspositionTable = None,
+                        ordering: MoveOrdering = None):
+    """ Returns the same move as recursive_minimax, skipping the branches
+    that cannot change which move that is.
+
+    Solved positions are kept in table, which defaults to the table shared
+    by every search on game. Below the root, moves are searched in the order
+    given by ordering, which defaults to a new HeuristicOrdering.
+    """
+    if table is None:
+        table = get_table(game)
+    if ordering is None:
+        ordering = HeuristicOrdering()
+    state = game.current_state
+    state.start_search()
+    best_score = -2
+    move_to_make = None
+    for move in distinct_moves(state):
+        score = alphabeta_helper(state.make_move(move), -1,
+                                 -max(best_score, -1), table,
+                                 ordering) * -1
+        if score > best_score:
+            best_score = score
+            move_to_make = move
+            if best_score == 1:  # nothing beats a win
+                break
+    return move_to_make
+
 # TODO: Implement an iterative version of the minimax strategy.
 
 
 def iterative_minimax(game)-> Any:
-    """a strategy to give the highest guranteeable score"""
+    """a strategy to give the highest guranteeable score
 
+    Instead of keeping a whole Tree, a stack holds one _Frame for each state
+    on the current line of play. Children are only created when their turn
+    to be scored comes, and each frame is dropped as soon as it is scored,
+    so memory grows with the depth of the game times its branching factor,
+    not with the size of its tree.
+    """
+    game.current_state.start_search()
+    root = _Frame(game.current_state, -2, 2)
     stack = Stack()
-    game_copy = deepcopy(game)
-    t = Tree(game_copy.current_state)
-    stack.add(t)
+    stack.add(root)
+    result = None  # score of the frame that was just finished
     while not stack.is_empty():
-        check = stack.remove()
-        if game_copy.is_over(check.state):
-            game_copy.current_state = check.state
-            if game_copy.is_winner\
-                        (game_copy.current_state.get_current_player_name()):
-                check.score = 1
-            elif not game_copy.is_winner('p1') \
-                    and not game_copy.is_winner('p2'):
-                check.score = 0
+        frame = stack.remove()
+        if frame.moves is None:
+            if frame.state.is_terminal():
+                result = _terminal_score(frame.state)
+                continue
+            if frame is root:
+                frame.moves = distinct_moves(frame.state)
             else:
-                check.score = -1
+                frame.moves = frame.state.get_distinct_moves()
+        elif result is not None:
+            if result * -1 > frame.best:
+                frame.best = result * -1
+                frame.best_move = frame.moves[frame.index - 1]
+            result = None
+
+        if frame.index == len(frame.moves):
+            result = frame.best
+            continue
+        child = _Frame(frame.state.make_move(frame.moves[frame.index]),
+                       -2, 2)
+        frame.index += 1
+        stack.add(frame)
+        stack.add(child)
+
+    return root.best_move
+
+
+class _Frame:
+    """
+    A state waiting to be scored by iterative_minimax or iterative_alphabeta.
 
-        elif check.children != []:
-            check.score = max([-1*c.score for c in check.children])
+    moves - the moves of state, or None until state is expanded
+    index - the number of moves already searched
+    best - the best score found so far, and best_move the move that gives it
+    """
+    __slots__ = ('state', 'ply', 'alpha', 'beta', 'window', 'moves', 'index',
+                 'best', 'best_move')
 
-        else:
-            check.children = []
-            stack.add(check)
-            for move in check.state.get_possible_moves():
-                check_new_state = deepcopy(check.state)
-                child_move = Tree(check_new_state.make_move(move))
-                child_move.move = move
-                check.children.append(child_move)
-                stack.add(child_move)
-
-    max_score = -5
-    move_to_make = None
-    for child in t.children:
-        if child.score*-1 > max_score:
-            max_score = child.score*-1
-            move_to_make = child.move
+    def __init__(self, state: Any, alpha: int, beta: int,
+                 ply: int = 0) -> None:
+        """
+        Create a _Frame for state, ply moves below the root, searched with
+        window (alpha, beta).
+        """
+        self.state = state
+        self.ply = ply
+        self.alpha = alpha
+        self.beta = beta
+        self.window = alpha
+        self.moves = None
+        self.index = 0
+        self.best = -2
+        self.best_move = None
+
+
+def iterative_alphabeta(game: Any, table: TranspositionTable = None,
+                        ordering: MoveOrdering = None) -> Any:
+    """ Returns the same move as iterative_minimax, skipping the branches
+    that cannot change which move that is.
+
+    Instead of expanding a whole Tree, a stack holds one _Frame for each
+    state on the current line of play, and children are only created when
+    their turn to be searched comes. table and ordering are used as in
+    recursive_alphabeta.
+    """
+    if table is None:
+        table = get_table(game)
+    if ordering is None:
+        ordering = HeuristicOrdering()
+    game.current_state.start_search()
+    root = _Frame(game.current_state, -2, 1)
+    stack = Stack()
+    stack.add(root)
+    result = None  # score of the frame that was just finished
+    while not stack.is_empty():
+        frame = stack.remove()
+        if frame.moves is None:
+            result = None if frame is root else \
+                _probe(table, frame.state, frame.alpha, frame.beta)
+            if result is None and frame.state.is_terminal():
+                result = _terminal_score(frame.state)
+                table.store(frame.state, result)
+            if result is not None:
+                continue
+            if frame is root:
+                frame.moves = distinct_moves(frame.state)
+            else:
+                frame.moves = ordering.order(
+                    frame.state, frame.state.get_distinct_moves(), frame.ply)
+        elif result is not None:
+            score = result * -1
+            if score > frame.best:
+                frame.best = score
+                frame.best_move = frame.moves[frame.index - 1]
+                frame.window = max(frame.window, score)
+            result = None
+
+        if frame.window >= frame.beta or frame.index == len(frame.moves):
+            if frame.window >= frame.beta:
+                ordering.cutoff(frame.best_move, frame.ply)
+            ordering.best(frame.state, frame.best_move)
+            result = frame.best
+            table.store(frame.state, frame.best,
+                        _bound(frame.best, frame.alpha, frame.beta))
+            continue
+        child = _Frame(frame.state.make_move(frame.moves[frame.index]),
+                       -frame.beta, -max(frame.window, -1), frame.ply + 1)
+        frame.index += 1
+        stack.add(frame)
+        stack.add(child)
+
+    return root.best_move
+
+
+# seconds iterative_deepening may spend choosing a move
+TIME_LIMIT = 1.0
+# estimates at the search frontier are scaled by this, so that proven
+# wins and losses always outrank guesses
+FRONTIER_WEIGHT = 0.5
+
+
+class _OutOfTime(Exception):
+    """
+    Raised inside an iterative_deepening search when its time runs out.
+    """
+
+
+class _Deepening:
+    """
+    One depth-limited alpha-beta search in iterative_deepening.
+
+    deadline - when the search must stop, or None to never stop it
+    evaluate - scores a state at the frontier from its current player's view
+    ordering - the MoveOrdering, which remembers each iteration's best moves
+               for the next one
+    cut - whether any state was scored by evaluate instead of being solved
+    """
 
+    def __init__(self, evaluate: Any, ordering: MoveOrdering) -> None:
+        """
+        Create a _Deepening that scores frontier states with evaluate and
+        orders moves with ordering.
+        """
+        self.deadline = None
+        self.evaluate = evaluate
+        self.ordering = ordering
+        self.nodes = 0
+        self.cut = False
+
+    def check_time(self) -> None:
+        """
+        Raise _OutOfTime if the deadline has passed.
+        """
+        if self.deadline is not None and monotonic() > self.deadline:
+            raise _OutOfTime
+
+    def search(self, state: Any, depth: int, alpha: float, beta: float,
+               ply: int = 1) -> float:
+        """
+        Return the score of the player to move at state, ply moves below the
+        root, looking depth moves ahead, as a bound if it falls outside
+        (alpha, beta).
+        """
+        self.nodes += 1
+        if self.nodes % 256 == 0:
+            self.check_time()
+        if state.is_terminal():
+            return _terminal_score(state)
+        if depth == 0:
+            # evaluate can be slow on large boards, so the clock is read
+            # before every call
+            self.check_time()
+            self.cut = True
+            return FRONTIER_WEIGHT * self.evaluate(state)
+
+        best_score = -2
+        best_move = None
+        for move in self.ordering.order(state, state.get_distinct_moves(),
+                                        ply):
+            state.apply(move)
+            score = self.search(state, depth - 1, -beta,
+                                -max(alpha, best_score), ply + 1) * -1
+            state.undo()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if best_score >= beta:
+                    self.ordering.cutoff(move, ply, depth * depth)
+                    break
+        self.ordering.best(state, best_move)
+        return best_score
+
+
+def iterative_deepening(game: Any, seconds: float = TIME_LIMIT,
+                        evaluate: Any = None,
+                        ordering: MoveOrdering = None) -> Any:
+    """ Returns the best move found by searching one move deeper at a time
+    until seconds have passed, or the game is solved.
+
+    States at the edge of each search are scored by evaluate, which defaults
+    to their rough_outcome. Moves are searched in the order given by
+    ordering, which defaults to a new HeuristicOrdering, so each search tries
+    the best moves of the one before it first and alpha-beta cuts off sooner.
+
+    If time runs out before the first, one move deep, search is done, the
+    best of the moves it scored is returned, or the first move if it scored
+    none.
+    """
+    if evaluate is None:
+        evaluate = _rough_outcome
+    if ordering is None:
+        ordering = HeuristicOrdering()
+    search = _Deepening(evaluate, ordering)
+    search.deadline = monotonic() + seconds
+    state = game.current_state
+    state.start_search()
+    moves = distinct_moves(state)
+    move_to_make = moves[0]
+    scores = {}
+    depth = 0
+    while True:
+        depth += 1
+        search.cut = False
+        moves.sort(key=lambda m: -scores.get(m, -1))
+        best_score = -2
+        new_scores = {}
+        try:
+            for move in moves:
+                search.check_time()
+                score = search.search(state.make_move(move), depth - 1, -1,
+                                      -max(best_score, -1)) * -1
+                new_scores[move] = score
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                    if best_score == 1:  # nothing beats a proven win
+                        break
+        except _OutOfTime:
+            if depth == 1 and new_scores:
+                move_to_make = best_move
+            break
+        move_to_make = best_move
+        scores = new_scores
+        if not search.cut or best_score == 1:
+            break  # the game is solved, deeper searches change nothing
     return move_to_make
 
 
+def _rough_outcome(state: Any) -> float:
+    """
+    Return the rough_outcome of state.
+    """
+    return state.rough_outcome()
+
+
+# one pool per worker count, kept alive between moves so that starting the
+# worker processes is only paid for once a session
+_pools = {}
+
+# what a worker process keeps between the root moves it is sent
+_worker = {}
+
+
+def get_pool(workers: int = None) -> tuple:
+    """
+    Return the (executor, best, table) of the process pool with workers
+    processes, starting it if it is not running yet. The workers share
+    best, the best root score found by the search the pool is running and
+    the first root move found to have it, and table, the
+    SharedTranspositionTable they all solve positions into.
+
+    workers defaults to the number of CPUs.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers not in _pools:
+        best = Array('i', 2)
+        table = SharedTranspositionTable()
+        _pools[workers] = (ProcessPoolExecutor(workers,
+                                               initializer=_start_worker,
+                                               initargs=(best, table)),
+                           best, table)
+    return _pools[workers]
+
+
+@atexit.register
+def shutdown_pools() -> None:
+    """
+    Stop every process pool started by get_pool, and free their tables.
+    """
+    for executor, _, table in _pools.values():
+        executor.shutdown(cancel_futures=True)
+        table.close()
+    _pools.clear()
+
+
+def _start_worker(best: Any, table: SharedTranspositionTable) -> None:
+    """
+    Set up a worker process of a pool that shares best and table.
+    """
+    _worker['best'] = best
+    _worker['table'] = table
+
+
+def _solve_root_move(state: Any, index: int, move: Any) -> int:
+    """
+    Return the score of playing move, the root move at index, at state for
+    the player to move, if it could still be the first move with the best
+    score. Otherwise return an upper bound that shows it is not.
+    """
+    best = _worker['best']
+    with best.get_lock():
+        score, first = best[0], best[1]
+    # moves after the first best move have to beat it, the ones before
+    # only have to tie it
+    alpha = max(score if index > first else score - 1, -1)
+    if alpha == 1:
+        return alpha
+    score = alphabeta_helper(state.make_move(move), -1, -alpha,
+                             _worker['table'], HeuristicOrdering()) * -1
+    if score > alpha:
+        with best.get_lock():
+            if score > best[0] or (score == best[0] and index < best[1]):
+                best[0], best[1] = score, index
+    return score
+
+
+def parallel_alphabeta(game: Any, workers: int = None) -> Any:
+    """ Returns the same move as recursive_alphabeta, solving the subtree
+    of each root move in its own worker process.
+
+    The workers share the best root score found so far, so a subtree started
+    after a good move is found only has to show that it is worse, and a
+    table of solved positions, so no worker solves a position another one
+    already has. The pool from get_pool(workers) is reused by every later
+    call.
+
+    Subtrees searched at the same time all start before any good move is
+    found, so they prune less than they would one after another.
+    alphabeta_benchmark.py times it against the number of workers.
+    """
+    executor, best, _ = get_pool(workers)
+    state = game.current_state
+    state.start_search()
+    moves = distinct_moves(state)
+    with best.get_lock():
+        best[0], best[1] = -2, len(moves)
+    scores = list(executor.map(_solve_root_move, [state] * len(moves),
+                               range(len(moves)), moves))
+    if not scores:
+        return None
+    return moves[scores.index(max(scores))]
+
+
 if __name__ == "__main__":
     from python_ta import check_all
 
@@ -3,9 +3,17 @@ An implementation of a state for SubtractSquare.
 
 NOTE: You do not have to run python-ta on this file.
 """
+from functools import lru_cache
+from math import isqrt
 from typing import Any
 from game_state import GameState
 
+# how many totals the rough outcomes are remembered for
+ROUGH_OUTCOME_CACHE = 1 << 16
+
+# _squares[i] is i ** 2, grown by squares_to as larger totals come up
+_squares = [0]
+
 
 class SubtractSquareState(GameState):
     """
@@ -19,6 +27,8 @@ class SubtractSquareState(GameState):
         """
         super().__init__(is_p1_turn)
         self.current_total = current_total
+        self._key = None
+        self._history = []
 
     def __str__(self) -> str:
         """
@@ -30,12 +40,7 @@ class SubtractSquareState(GameState):
         """
         Return all possible moves that can be applied to this state.
         """
-        moves = []
-        for i in range(1, self.current_total + 1):
-            if i ** 2 <= self.current_total:
-                moves.append(i ** 2)
-
-        return moves
+        return squares_to(self.current_total)
 
     def make_move(self, move: Any) -> "SubtractSquareState":
         """
@@ -48,6 +53,72 @@ class SubtractSquareState(GameState):
                                         self.current_total - move)
         return new_state
 
+    def apply(self, move: Any) -> None:
+        """
+        Apply move to this state in place, so that undo() can take it back.
+        """
+        if type(move) == str:
+            move = int(move)
+
+        self._history.append(move)
+        self.current_total -= move
+        self.p1_turn = not self.p1_turn
+        self._key = None
+
+    def undo(self) -> None:
+        """
+        Take back the last move applied to this state by apply().
+        """
+        self.current_total += self._history.pop()
+        self.p1_turn = not self.p1_turn
+        self._key = None
+
+    def move_priority(self, move: Any) -> int:
+        """
+        Return move itself, so that searches try the largest square first.
+        """
+        return int(move)
+
+    def is_terminal(self) -> bool:
+        """
+        Return whether the game is over at this state.
+        """
+        return self.current_total == 0
+
+    def winner(self) -> Any:
+        """
+        Return 'p1' or 'p2' if that player has won at this state, or None if
+        the game is not over.
+        """
+        if self.current_total != 0:
+            return None
+        # the player who subtracted to 0 is the one not moving now
+        if self.p1_turn:
+            return 'p2'
+        return 'p1'
+
+    def key(self) -> tuple:
+        """
+        Return a tuple that identifies this state: equal states have equal
+        keys.
+        """
+        if self._key is None:
+            self._key = (self.p1_turn, self.current_total)
+        return self._key
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether other is a SubtractSquareState equal to this one.
+        """
+        return isinstance(other, SubtractSquareState) and \
+            self.key() == other.key()
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of this state, so it can key dicts and sets.
+        """
+        return hash(self.key())
+
     def __repr__(self) -> str:
         """
         Return a representation of this state (which can be used for
@@ -61,14 +132,36 @@ class SubtractSquareState(GameState):
         Return an estimate in interval [LOSE, WIN] of best outcome the current
         player can guarantee from state self.
         """
-        if is_pos_square(self.current_total):
-            return self.WIN
-        elif all([is_pos_square(self.current_total - n ** 2)
-                  for n in range(1, self.current_total + 1)
-                  if n ** 2 < self.current_total]):
-            return self.LOSE
+        return _rough_outcome(self.current_total)
+
 
-        return self.DRAW
+def squares_to(n: int) -> list:
+    """
+    Return a new list of the positive squares up to n, smallest first, taken
+    from a table shared by every state.
+
+    >>> squares_to(10)
+    [1, 4, 9]
+    """
+    root = isqrt(n)
+    while len(_squares) <= root:
+        _squares.append(len(_squares) ** 2)
+    return _squares[1:root + 1]
+
+
+@lru_cache(maxsize=ROUGH_OUTCOME_CACHE)
+def _rough_outcome(total: int) -> float:
+    """
+    Return the rough outcome of a state with current total total: a win if
+    total is a square, a loss if every move leaves a square, and a draw
+    otherwise.
+    """
+    if is_pos_square(total):
+        return GameState.WIN
+    for square in squares_to(total):
+        if not is_pos_square(total - square):
+            return GameState.DRAW
+    return GameState.LOSE
 
 
 def is_pos_square(n: int) -> bool:
@@ -80,7 +173,7 @@ def is_pos_square(n: int) -> bool:
     >>> is_pos_square(9)
     True
     """
-    return 0 < n and (round(n ** 0.5) ** 2 == n)
+    return 0 < n and isqrt(n) ** 2 == n
 
 
 if __name__ == "__main__":
@@ -0,0 +1,510 @@
+"""
+Retrograde-analysis tablebases: every position of a small Stonehenge board,
+solved once from the full boards back to the empty one.
+"""
+import os
+from array import array
+from bisect import bisect_right
+from itertools import combinations
+from mmap import ACCESS_READ, mmap
+from struct import Struct
+from typing import Any
+from game_state import StoneHengeState, count_cells, get_geometry
+from strategy import iterative_deepening
+
+# the largest board solve() is used for by the tablebase strategy
+MAX_SIZE = 3
+
+# where get_tablebase looks for tablebase files, and saves the tablebases
+# it solves, making the directory if it has to: the directory named by the
+# STONEHENGE_TABLEBASES environment variable, or else one in the user's
+# cache directory, never next to the source files
+TABLEBASE_DIR = os.environ.get('STONEHENGE_TABLEBASES') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'stonehenge', 'tablebases')
+
+# a tablebase file starts with MAGIC, the VERSION of the format, the board
+# size, flags, the number of positions and the number of cell sharings, and
+# then holds the PositionRanking's offsets, the values packed 4 to a byte
+# as value + 1, and, if flags has HAS_MOVES, a best move byte per position.
+# Numbers are in the machine's byte order, so the file can be mapped as is.
+MAGIC = b'SHTB'
+VERSION = 1
+HAS_MOVES = 1
+NO_MOVE = 255
+_HEADER = Struct('=4sBBBxQQ')
+
+
+class PositionRanking:
+    """
+    Numbers the positions of a Stonehenge board with side length size
+    from 0 to len(self) - 1.
+
+    A position is seen from the player to move: the cells they own (mine),
+    the cells their opponent owns (theirs) and a tie bit for each ley-line
+    that is full and split evenly, set if the player to move captured it.
+    The owner of every other ley-line follows from its cells. Which player
+    is p1 does not matter, so mine has as many cells as theirs, or one
+    fewer.
+
+    Positions are numbered by the cells, in groups by the number of cells
+    each player owns and then by the colex rank of mine and of theirs among
+    the free cells, and then by the tie bits.
+
+    size - the side length of the board
+    cells - the number of cells on the board
+    configs - the number of ways to share the cells between the players
+    offsets - the rank of the first position of each sharing of the cells,
+              and then the number of positions
+    """
+
+    def __init__(self, size: int, offsets: Any = None) -> None:
+        """
+        Create the PositionRanking of a board with side length size.
+
+        offsets, the rank of the first position of each sharing of the
+        cells and then the number of positions, is worked out if it is not
+        given, for example from a tablebase file.
+        """
+        geometry = get_geometry(size)
+        self.size = size
+        self.cells = len(geometry.labels)
+        self._lines = list(zip(geometry.lines, geometry.needs))
+        self._comb = [[0] * (self.cells + 2) for _ in range(self.cells + 1)]
+        for n in range(self.cells + 1):
+            self._comb[n][0] = 1
+            for k in range(1, n + 1):
+                self._comb[n][k] = self._comb[n - 1][k - 1] + \
+                    self._comb[n - 1][k]
+
+        self._bases = {}
+        self.configs = 0
+        for mine, theirs in self.groups():
+            self._bases[mine, theirs] = self.configs
+            self.configs += self._comb[self.cells][mine] * \
+                self._comb[self.cells - mine][theirs]
+
+        self.offsets = offsets
+        if offsets is not None:
+            return
+        self.offsets = array('q', bytes(8 * (self.configs + 1)))
+        for mine, theirs in self.configurations():
+            config = self.config_rank(mine, theirs)
+            self.offsets[config + 1] = 1 << len(self.ties(mine, theirs))
+        for config in range(self.configs):
+            self.offsets[config + 1] += self.offsets[config]
+
+    def __len__(self) -> int:
+        """
+        Return the number of positions.
+        """
+        return self.offsets[self.configs]
+
+    def groups(self) -> list:
+        """
+        Return the (mine, theirs) numbers of cells each player can own,
+        from the empty board to the full one.
+        """
+        return [(mine, mine + extra) for mine in range(self.cells + 1)
+                for extra in (0, 1) if 2 * mine + extra <= self.cells]
+
+    def configurations(self, group: tuple = None) -> Any:
+        """
+        Yield every (mine, theirs) pair of cell masks, or only those with
+        the numbers of cells in group.
+        """
+        for mine_count, theirs_count in [group] if group else self.groups():
+            for mine_cells in combinations(range(self.cells), mine_count):
+                mine = 0
+                for cell in mine_cells:
+                    mine |= 1 << cell
+                free = [cell for cell in range(self.cells)
+                        if not mine >> cell & 1]
+                for theirs_cells in combinations(free, theirs_count):
+                    theirs = 0
+                    for cell in theirs_cells:
+                        theirs |= 1 << cell
+                    yield mine, theirs
+
+    def ties(self, mine: int, theirs: int) -> list:
+        """
+        Return the ley-lines, by number, that are full and split evenly
+        between mine and theirs.
+        """
+        return [line for line in range(len(self._lines))
+                if count_cells(mine & self._lines[line][0]) ==
+                count_cells(theirs & self._lines[line][0]) >=
+                self._lines[line][1]]
+
+    def config_rank(self, mine: int, theirs: int) -> int:
+        """
+        Return the number of the sharing of the cells into mine and theirs.
+        """
+        comb = self._comb
+        mine_count = 0
+        theirs_count = 0
+        mine_rank = 0
+        theirs_rank = 0
+        free = 0
+        for cell in range(self.cells):
+            if mine >> cell & 1:
+                mine_count += 1
+                mine_rank += comb[cell][mine_count]
+            else:
+                if theirs >> cell & 1:
+                    theirs_count += 1
+                    theirs_rank += comb[free][theirs_count]
+                free += 1
+        return self._bases[mine_count, theirs_count] + \
+            mine_rank * comb[self.cells - mine_count][theirs_count] + \
+            theirs_rank
+
+    def rank(self, mine: int, theirs: int, ties: int) -> int:
+        """
+        Return the number of the position with cells mine and theirs, and
+        tie bits ties.
+        """
+        return self.offsets[self.config_rank(mine, theirs)] + ties
+
+    def rank_state(self, state: Any) -> int:
+        """
+        Return the number of the position of state, a StoneHengeState on a
+        board with this size.
+        """
+        if state.p1_turn:
+            mine, theirs, my_lines = state.p1_cells, state.p2_cells, \
+                state.p1_lines
+        else:
+            mine, theirs, my_lines = state.p2_cells, state.p1_cells, \
+                state.p2_lines
+        ties = 0
+        tied = self.ties(mine, theirs)
+        for i in range(len(tied)):
+            if my_lines >> tied[i] & 1:
+                ties |= 1 << i
+        return self.rank(mine, theirs, ties)
+
+    def unrank(self, rank: int) -> tuple:
+        """
+        Return the (mine, theirs, ties) of the position numbered rank.
+        """
+        config = bisect_right(self.offsets, rank, 0, self.configs) - 1
+        mine, theirs = self.config_unrank(config)
+        return mine, theirs, rank - self.offsets[config]
+
+    def config_unrank(self, config: int) -> tuple:
+        """
+        Return the (mine, theirs) cell masks of the sharing of the cells
+        numbered config.
+        """
+        for group in reversed(self.groups()):
+            if self._bases[group] <= config:
+                break
+        mine_count, theirs_count = group
+        mine_rank, theirs_rank = divmod(
+            config - self._bases[group],
+            self._comb[self.cells - mine_count][theirs_count])
+        mine = 0
+        for cell in self._colex_unrank(mine_rank, mine_count):
+            mine |= 1 << cell
+        free = [cell for cell in range(self.cells) if not mine >> cell & 1]
+        theirs = 0
+        for index in self._colex_unrank(theirs_rank, theirs_count):
+            theirs |= 1 << free[index]
+        return mine, theirs
+
+    def _colex_unrank(self, rank: int, count: int) -> list:
+        """
+        Return the count numbers whose set has colex rank rank.
+        """
+        numbers = []
+        for i in range(count, 0, -1):
+            number = i - 1
+            while self._comb[number + 1][i] <= rank:
+                number += 1
+            rank -= self._comb[number][i]
+            numbers.append(number)
+        return numbers
+
+    def unrank_state(self, rank: int, p1_turn: bool = True) -> Any:
+        """
+        Return the StoneHengeState of the position numbered rank, with p1
+        to move if p1_turn is True and p2 to move otherwise.
+        """
+        mine, theirs, ties = self.unrank(rank)
+        my_lines, their_lines = self.lines(mine, theirs, ties)
+        if p1_turn:
+            return StoneHengeState(True, self.size, mine, theirs, my_lines,
+                                   their_lines)
+        return StoneHengeState(False, self.size, theirs, mine, their_lines,
+                               my_lines)
+
+    def lines(self, mine: int, theirs: int, ties: int) -> tuple:
+        """
+        Return the masks of the ley-lines captured by each player in the
+        position with cells mine and theirs, and tie bits ties.
+        """
+        my_lines = 0
+        their_lines = 0
+        tie = 0
+        for line in range(len(self._lines)):
+            mask, need = self._lines[line]
+            num_mine = count_cells(mine & mask)
+            num_theirs = count_cells(theirs & mask)
+            if num_mine == num_theirs >= need:
+                if ties >> tie & 1:
+                    my_lines |= 1 << line
+                else:
+                    their_lines |= 1 << line
+                tie += 1
+            elif num_mine >= need and num_mine > num_theirs:
+                my_lines |= 1 << line
+            elif num_theirs >= need and num_theirs > num_mine:
+                their_lines |= 1 << line
+        return my_lines, their_lines
+
+    def successor(self, mine: int, theirs: int, ties: int,
+                  cell: int) -> int:
+        """
+        Return the number of the position after the player to move claims
+        cell, which is seen from their opponent.
+        """
+        mine |= 1 << cell
+        after = 0
+        tie = 0
+        new_tie = 0
+        for mask, need in self._lines:
+            num_mine = count_cells(mine & mask)
+            if num_mine == count_cells(theirs & mask) >= need:
+                if mask >> cell & 1:
+                    # only just full: the opponent reached need first
+                    after |= 1 << new_tie
+                else:
+                    if not ties >> tie & 1:
+                        after |= 1 << new_tie
+                    tie += 1
+                new_tie += 1
+        return self.rank(theirs, mine, after)
+
+
+class Tablebase:
+    """
+    The value and best move of every position of a PositionRanking.
+
+    ranking - the PositionRanking that numbers the positions
+    values - the score of each position for the player to move
+    moves - the cell number of the best move at each position, or -1
+    """
+
+    def __init__(self, ranking: PositionRanking, values: Any,
+                 moves: Any) -> None:
+        """
+        Create the Tablebase of ranking with values and moves.
+        """
+        self.ranking = ranking
+        self.values = values
+        self.moves = moves
+
+    def value_at(self, rank: int) -> int:
+        """
+        Return the score of the player to move at the position rank.
+        """
+        return self.values[rank]
+
+    def move_at(self, rank: int) -> int:
+        """
+        Return the cell number of the best move at the position rank, or -1
+        if the game is over there.
+        """
+        return self.moves[rank]
+
+    def value(self, state: Any) -> int:
+        """
+        Return the score of the player to move at state.
+        """
+        return self.value_at(self.ranking.rank_state(state))
+
+    def best_move(self, state: Any) -> Any:
+        """
+        Return the letter of the best move at state, or None if the game is
+        over.
+        """
+        cell = self.move_at(self.ranking.rank_state(state))
+        if cell < 0:
+            return None
+        return get_geometry(self.ranking.size).labels[cell]
+
+    def write(self, path: str, moves: bool = True) -> None:
+        """
+        Save this Tablebase to the file path, with the best moves if moves
+        is True.
+        """
+        ranking = self.ranking
+        packed = bytearray((len(ranking) + 3) // 4)
+        for rank in range(len(ranking)):
+            packed[rank >> 2] |= self.value_at(rank) + 1 << (rank & 3) * 2
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, ranking.size,
+                                    HAS_MOVES if moves else 0, len(ranking),
+                                    ranking.configs))
+            file.write(array('q', ranking.offsets).tobytes())
+            file.write(packed)
+            if moves:
+                file.write(bytes(self.move_at(rank) % 256
+                                 for rank in range(len(ranking))))
+
+
+class MappedTablebase(Tablebase):
+    """
+    A Tablebase read straight from a file written by Tablebase.write, which
+    is memory-mapped instead of read in: opening it parses only its header,
+    and processes that map the same file share one copy of it in the page
+    cache.
+
+    Files without best moves find them by looking up every move's value.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the tablebase file path.
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, version, size, flags, positions, configs = \
+            _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} tablebase file'.format(
+                path, VERSION))
+        view = memoryview(self._map)
+        start = _HEADER.size
+        end = start + 8 * (configs + 1)
+        offsets = view[start:end].cast('q')
+        start, end = end, end + (positions + 3) // 4
+        moves = None
+        if flags & HAS_MOVES:
+            moves = view[end:end + positions]
+        super().__init__(PositionRanking(size, offsets), view[start:end],
+                         moves)
+
+    def value_at(self, rank: int) -> int:
+        """
+        Return the score of the player to move at the position rank.
+        """
+        return (self.values[rank >> 2] >> (rank & 3) * 2 & 3) - 1
+
+    def move_at(self, rank: int) -> int:
+        """
+        Return the cell number of the best move at the position rank, or -1
+        if the game is over there.
+        """
+        cell = self.moves[rank]
+        return -1 if cell == NO_MOVE else cell
+
+    def best_move(self, state: Any) -> Any:
+        """
+        Return the letter of the best move at state, or None if the game is
+        over.
+        """
+        if self.moves is not None:
+            return super().best_move(state)
+        best = None
+        best_score = -2
+        for move in state.get_possible_moves():
+            score = -self.value(state.make_move(move))
+            if score > best_score:
+                best = move
+                best_score = score
+        return best
+
+
+def solve(size: int) -> Tablebase:
+    """
+    Return the Tablebase of a board with side length size, solved from the
+    full boards back to the empty one, one number of claimed cells at a
+    time, so every position is scored after all the positions it leads to.
+
+    The best move is the first one, in board order, with the best score,
+    the same one recursive_minimax chooses.
+    """
+    ranking = PositionRanking(size)
+    need = get_geometry(size).need
+    values = array('b', bytes(len(ranking)))
+    moves = array('b', [-1]) * len(ranking)
+    for group in reversed(ranking.groups()):
+        for mine, theirs in ranking.configurations(group):
+            free = [cell for cell in range(ranking.cells)
+                    if not (mine | theirs) >> cell & 1]
+            first = ranking.rank(mine, theirs, 0)
+            for ties in range(1 << len(ranking.ties(mine, theirs))):
+                my_lines, their_lines = ranking.lines(mine, theirs, ties)
+                my_lines = count_cells(my_lines)
+                their_lines = count_cells(their_lines)
+                if max(my_lines, their_lines) >= need or not free:
+                    values[first + ties] = (my_lines > their_lines) - \
+                        (my_lines < their_lines)
+                    continue
+                best = -2
+                for cell in free:
+                    score = -values[ranking.successor(mine, theirs, ties,
+                                                      cell)]
+                    if score > best:
+                        best = score
+                        moves[first + ties] = cell
+                values[first + ties] = best
+    return Tablebase(ranking, values, moves)
+
+
+_tablebases = {}
+
+
+def tablebase_path(size: int) -> str:
+    """
+    Return the path of the tablebase file of a board with side length size
+    in TABLEBASE_DIR.
+    """
+    return os.path.join(TABLEBASE_DIR, 'stonehenge{}.tb'.format(size))
+
+
+def get_tablebase(size: int) -> Tablebase:
+    """
+    Return the Tablebase of a board with side length size: mapped from its
+    file in TABLEBASE_DIR if there is one, or else solved and saved there,
+    so other processes can map it instead of solving it again.
+
+    The file is written under a temporary name and renamed into place, so
+    no process maps a file that is only partly written. If it cannot be
+    saved, the solved Tablebase is still returned.
+    """
+    if size not in _tablebases:
+        path = tablebase_path(size)
+        if os.path.exists(path):
+            _tablebases[size] = MappedTablebase(path)
+        else:
+            _tablebases[size] = solve(size)
+            partial = '{}.{}'.format(path, os.getpid())
+            try:
+                os.makedirs(TABLEBASE_DIR, exist_ok=True)
+                _tablebases[size].write(partial)
+                os.replace(partial, path)
+            except OSError:
+                pass
+    return _tablebases[size]
+
+
+def tablebase(game: Any) -> Any:
+    """ Returns the move recursive_minimax would, looked up in the
+    tablebase of the board's size.
+
+    Boards larger than MAX_SIZE are too large to solve, and fall back to
+    iterative_deepening.
+    """
+    state = game.current_state
+    if getattr(state, 'board_size', MAX_SIZE + 1) > MAX_SIZE:
+        return iterative_deepening(game)
+    return get_tablebase(state.board_size).best_move(state)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+
+    check_all(config="a2_pyta.txt")